@@ -0,0 +1,55 @@
+""" micro-benchmarks of ViewList against SparseSet for the operations of a backtracking search:
+    usage: python bench_lists.py [domain size] [repetitions] """
+import sys
+from timeit import timeit
+from efficient_lists import SparseSet, ViewList
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+REPEAT = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+values = list(range(N))
+even = lambda val: val % 2 == 0
+
+# the structures are built once, as in the search, every repetition changes and then restores them
+view_list = ViewList(values)
+sparse_set = SparseSet(N)
+
+# the variable queue: take the first variable at every level, then backtrack
+def queue_view_list():
+    queue = view_list
+    while queue:
+        queue = queue[1:]
+
+def queue_sparse_set():
+    size = sparse_set.size
+    for i in values:
+        sparse_set.remove(i)
+    sparse_set.restore(size)
+
+# a domain pruned to half its values, then restored
+def prune_view_list():
+    pruned = ViewList([val for val in view_list if even(val)])
+
+def prune_sparse_set():
+    size = sparse_set.size
+    sparse_set.filter(even, values)
+    sparse_set.restore(size)
+
+# removing the values one at a time: ViewList copies on every write, the sparse set swaps
+def remove_view_list():
+    domain = view_list[0:]
+    for i in range(N - 1, 0, -1):
+        domain[i] = domain[0]
+
+def remove_sparse_set():
+    size = sparse_set.size
+    for i in range(N - 1, 0, -1):
+        sparse_set.remove(i)
+    sparse_set.restore(size)
+
+if __name__ == '__main__':
+    print(f"domain size {N}, {REPEAT} repetitions, time per repetition:")
+    for name in ['queue', 'prune', 'remove']:
+        for impl in ['view_list', 'sparse_set']:
+            f = globals()[f'{name}_{impl}']
+            t = timeit(f, number=REPEAT)
+            print(f"{name:8} {impl:12} {t / REPEAT * 1e6:8.2f}us")
@@ -1,7 +1,8 @@
 from typing import NewType
 from yaml import safe_load as yaml_load
 
-from utils import pretty_print_timetable
+from check_constraints import parse_interval, parse_subject_room_prof
+from utils import get_profs_initials, pretty_print_timetable
 
 Day = NewType('Day', str)
 Slot = NewType('Slot', int)
@@ -73,7 +74,138 @@ class Commons:
     @staticmethod
     def data_ready() -> bool:
         return Commons._initialized
-    
+
+    @staticmethod
+    def _min_sessions(course: Course) -> int | None:
+        """ the fewest slots the course can be taught in to reach its capacity, filling its
+            largest rooms first (at most as many rooms at a time as it has teachers),
+            None if even all of them in every slot are not enough """
+        caps = sorted((Commons.CAP_ROOMS[room] for room in Commons.ROOMS if course in Commons.REP_ROOMS[room]),
+                      reverse=True)[:len(Commons.REP_COURSES[course])]
+        need, sessions = Commons.CAP_COURSES[course], 0
+        for cap in caps:
+            if need <= 0: break
+            count = min(Commons.TOTAL_SLOTS, -(-need // cap))
+            sessions += count
+            need -= count * cap
+        return sessions if need <= 0 else None
+
+    @staticmethod
+    def infeasibilities() -> list[str]:
+        """ checks necessary conditions for the mandatory constraints before any search,
+            returns a description of every violated bound (empty if none is violated) """
+        if not Commons.data_ready():
+            raise Exception("Commons not initialized")
+        problems = []
+        if Commons.TOTAL_CAPACITY < Commons.NEEDED_CAPACITY:
+            problems.append(f"the courses need a capacity of {Commons.NEEDED_CAPACITY} "
+                            f"but all the rooms in all the slots hold {Commons.TOTAL_CAPACITY}")
+        min_sessions = {}
+        for course in Commons.COURSES:
+            rooms = [room for room in Commons.ROOMS if course in Commons.REP_ROOMS[room]]
+            if not Commons.REP_COURSES[course]:
+                problems.append(f"course {course} has no teacher")
+            elif not rooms:
+                problems.append(f"course {course} has no room")
+            elif (sessions := Commons._min_sessions(course)) is None:
+                per_slot = min(len(rooms), len(Commons.REP_COURSES[course]))
+                reachable = Commons.TOTAL_SLOTS * sum(sorted((Commons.CAP_ROOMS[room] for room in rooms),
+                                                             reverse=True)[:per_slot])
+                problems.append(f"course {course} needs a capacity of {Commons.CAP_COURSES[course]} but reaches "
+                                f"at most {reachable} ({per_slot} of its rooms at a time, {Commons.TOTAL_SLOTS} slots)")
+            else: min_sessions[course] = sessions
+
+        # the courses taught only by a group of teachers fit in the 7 slots of each of them
+        for teachers in {frozenset(Commons.REP_COURSES[course]) for course in min_sessions}:
+            courses = [course for course in min_sessions if Commons.REP_COURSES[course] <= teachers]
+            needed = sum(min_sessions[course] for course in courses)
+            if needed > 7 * len(teachers):
+                problems.append(f"the courses taught only by {', '.join(sorted(teachers))} ({', '.join(sorted(courses))}) "
+                                f"need at least {needed} slots but they can teach at most {7 * len(teachers)}")
+
+        # one course in every room and one room for every teacher in each slot
+        needed = sum(min_sessions.values())
+        available = Commons.TOTAL_SLOTS * min(len(Commons.ROOMS), len(Commons.TEACHERS))
+        if needed > available:
+            problems.append(f"the courses need at least {needed} room slots but at most {available} can be used")
+        return problems
+
+    @staticmethod
+    def components() -> list[tuple[list[Room], list[Teacher], list[Course]]]:
+        """ splits the graph of the rooms and teachers compatible with every course into its connected
+            components, which share no rooms and no teachers and can be scheduled independently,
+            returns the (rooms, teachers, courses) of every component with a course, largest first """
+        if not Commons.data_ready():
+            raise Exception("Commons not initialized")
+        # union-find over the courses, joined by the rooms and teachers they have in common
+        parent = {course: course for course in Commons.COURSES}
+        def find(course: Course) -> Course:
+            while parent[course] != course:
+                parent[course] = course = parent[parent[course]]
+            return course
+        def join(courses):
+            courses = list(courses)
+            for other in courses[1:]:
+                parent[find(other)] = find(courses[0])
+        for room in Commons.ROOMS: join(Commons.REP_ROOMS[room])
+        teacher_courses = {teacher: [] for teacher in Commons.TEACHERS}
+        for course in Commons.COURSES:
+            for teacher in Commons.REP_COURSES[course]: teacher_courses[teacher].append(course)
+        for courses in teacher_courses.values(): join(courses)
+
+        # the rooms and teachers of a component in the order of the input
+        components: dict[Course, tuple[list[Room], list[Teacher], list[Course]]] = {}
+        for course in Commons.COURSES:
+            components.setdefault(find(course), ([], [], []))[2].append(course)
+        for room in Commons.ROOMS:
+            if Commons.REP_ROOMS[room]: components[find(next(iter(Commons.REP_ROOMS[room])))][0].append(room)
+        for teacher, courses in teacher_courses.items():
+            if courses: components[find(courses[0])][1].append(teacher)
+        return sorted(components.values(), key=lambda c: len(c[0]) * len(c[1]), reverse=True)
+
+    @staticmethod
+    def restrict(rooms: list[Room], teachers: list[Teacher], courses: list[Course]):
+        """ keeps only the data of one component returned by components() """
+        Commons.ROOMS, Commons.TEACHERS, Commons.COURSES = rooms, teachers, courses
+        Commons.REP_ROOMS = {room: Commons.REP_ROOMS[room] for room in rooms}
+        Commons.REP_COURSES = {course: Commons.REP_COURSES[course] for course in courses}
+        Commons.CAP_ROOMS = {room: Commons.CAP_ROOMS[room] for room in rooms}
+        Commons.CAP_COURSES = {course: Commons.CAP_COURSES[course] for course in courses}
+        Commons.FREE_DAYS = {teacher: Commons.FREE_DAYS[teacher] for teacher in teachers}
+        Commons.FREE_SLOTS = {teacher: Commons.FREE_SLOTS[teacher] for teacher in teachers}
+        Commons.TOTAL_CAPACITY = Commons.TOTAL_SLOTS * sum(Commons.CAP_ROOMS.values())
+        Commons.NEEDED_CAPACITY = sum(Commons.CAP_COURSES.values())
+
+    @staticmethod
+    def read_timetable(file: str) -> Sol:
+        """ reads a timetable printed by print_timetable for the current input, which may have changed
+            since: the cells of days, intervals, rooms or teachers it does not have anymore and the values
+            it does not allow are left empty """
+        if not Commons.data_ready():
+            raise Exception("Commons not initialized")
+        _, initials_to_teacher = get_profs_initials(Commons.TEACHERS)
+        allowed = lambda room, val: room in Commons.REP_ROOMS and val[A_COURSE] in Commons.REP_ROOMS[room] \
+            and val[A_TEACHER] in Commons.REP_COURSES[val[A_COURSE]]
+        timetable: Sol = {}
+        days, slot = [], None
+        with open(file, 'r') as f:
+            for line in f:
+                if not line.startswith('|'): continue
+                cells = [cell.strip() for cell in line.strip().split('|')][1:-1]
+                if cells[0] == 'Interval':
+                    days = cells[1:]
+                    continue
+                # the interval is only written on the first row of its rooms
+                if cells[0]: slot = Slot(parse_interval(cells[0])[0])
+                for day, cell in zip(days, cells[1:]):
+                    try:
+                        course, room, teacher = parse_subject_room_prof(cell, initials_to_teacher)
+                    except (KeyError, IndexError):
+                        continue
+                    val = (teacher, course) if course else None
+                    timetable[(day, slot, room)] = val if val and allowed(room, val) else None
+        return timetable
+
     @staticmethod
     def print_timetable(timetable: Sol):
         print(pretty_print_timetable({
@@ -1,8 +1,14 @@
 from __future__ import annotations
-from copy import deepcopy
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice, product
 from math import inf
-from typing import Any, Callable, Generic, List, Literal, NewType, Sequence, TypeVar, override
-from efficient_lists import ViewList
+from multiprocessing import Value
+from os import cpu_count
+from random import Random
+from time import perf_counter, time
+from typing import Any, Callable, Generator, Generic, Iterator, Iterable, List, Literal, NewType, Sequence, TypeVar, cast, override
+from efficient_lists import SparseSet, ViewList
 
 # type variable for the type of a variable (read this 2, 3 times :)))
 VarType = TypeVar('VarType')
@@ -24,16 +30,71 @@ C_VAR_LIST = 0
 C_RELATION = 1
 C_COST = 2
 
+# a pruning ⟨t, p, d⟩ removes from the domains of the (unassigned) variables in t
+# all the values that do not satisfy the predicate p, d is an optional dependent variable
+# whose value also justifies the pruning (used to explain failures when backjumping)
+type Pruning[VarType, Domain] = tuple[Sequence[VarType], UnaryPredicate[Domain]] | \
+                                tuple[Sequence[VarType], UnaryPredicate[Domain], Any]
+
+# a nogood is a partial assignment that can not be extended to a better solution
+type Nogood[VarType, Domain] = frozenset[tuple[VarType, Domain]]
+
+# none: constraints are only checked once all their variables are assigned
+# fc: forward checking, constraints with exactly one unassigned variable prune its domain
+# ac3: forward checking followed by arc consistency on binary and ternary constraints
+type Propagation = Literal['none', 'fc', 'ac3']
+
+# static: the order in which the variables were given
+# mrv: minimum remaining values, the variable with the smallest domain
+# degree: the variable involved in most constraints with other unassigned variables
+# domwdeg: the smallest ratio between the domain size and the weighted degree, where the
+# weights of the constraints and variables are increased every time they cause a failure
+type VarOrder = Literal['static', 'mrv', 'degree', 'domwdeg']
+
+# none: a single run of the search
+# luby: the node limit of the i-th run is restart_base * luby(i), i.e. 1 1 2 1 1 2 4 1 1 2 ...
+# geometric: the node limit grows by restart_factor after every run
+type Restarts = Literal['none', 'luby', 'geometric']
+
+def luby(i: int) -> int:
+    """ the i-th term (counting from 1) of the Luby sequence """
+    while True:
+        k = i.bit_length()
+        # i = 2ᵏ - 1 ends a block of the sequence, the rest of the block repeats the sequence
+        if i == (1 << k) - 1: return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
+
+# nodes between two reads of the best cost shared by a parallel search
+SHARED_COST_PERIOD = 64
+
 DEBUG = False
 def log(*args, **kwargs):
     if DEBUG: print(*args, **kwargs)
 
+class _Frame:
+    """ the state of a variable on the explicit stack of the search """
+    __slots__ = ('var', 'values', 'index', 'cost', 'bound', 'assigned', 'trail_mark', 'conflicts')
+
+    def __init__(self, var, values, cost: float, bound: float):
+        self.var = var
+        self.values = values
+        self.index = 0
+        self.cost = cost
+        # lower bound of the cost the unassigned variables (this one included) will add
+        self.bound = bound
+        self.assigned = False
+        # the earlier variables whose values caused the failures of this variable's values
+        self.conflicts = set()
+
 class PCSP(Generic[VarType, Domain]):
     type Solution = dict[VarType, Domain]
-    type Dependency = tuple[Any, Callable[[Any | None], tuple[Any, bool]], float]
+    # a solution found by the search, with its cost and the number of iterations until it was found
+    type Incumbent = tuple[Solution, float, int]
+    type Dependency = tuple[Any, Callable[[Any | None, VarType, Domain], tuple[Any, bool]], float]
     # we will implement an optimized version of constraint propagation for the case
     # where setting a variable to a value fully determines the value of another variable
     # based on the assigned value of the first variable and the old value of the second variable
+    # (the update function receives the old value, the assigned variable and its value)
     # and the update of the dependent variable can also fail resulting in an unsatisfied constraint
 
     _best_solution: Solution
@@ -41,12 +102,79 @@ class PCSP(Generic[VarType, Domain]):
     _best_cost: float  # we will use inf for +∞ which is a float
     _iterations: int
 
-    _domains: dict[VarType, ViewList[Domain]]
+    # the domains are the values of the template of each variable (shared between variables and
+    # never changed) whose indices are in its sparse set, created when the domain is first pruned
+    _templates: dict[VarType, list[Domain]]
+    _domain_sets: dict[VarType, SparseSet]
+    # undo stack shared by the solution, the dependent variables and the domains: every change
+    # pushes (container, key, old value) and backtracking pops the entries above a level marker
+    # (the length of the trail when the level was entered), a None old value means the key was missing,
+    # for a sparse set the old value is its size before the variable (the key) was pruned
+    _trail: list[tuple[dict | SparseSet, Any, Any]]
+    _propagation: Propagation
+    # the variables assigned so far are _variables[:depth], in the order they were assigned
+    _variables: list[VarType]
+    _order: VarOrder
+    _weights: list[int]
+    _var_weights: dict[VarType, int]
     _acceptable_cost: float
-    _constraints: dict[VarType, list[Constraint[VarType, Domain]]]
+    # partial solutions costing more than this are not explored
+    _max_cost: float
+    # lower bound of the cost each unassigned variable will add, kept up to date when its domain
+    # is pruned, and the change of their sum caused by the propagation of the last assignment
+    _bounds: dict[VarType, float]
+    _bound_delta: float
+    _constraints: list[Constraint[VarType, Domain]]
+    # readiness index: the constraints (as indices in _constraints) each variable takes part in
+    # and, for every constraint, the number of its variables that are not assigned yet
+    _var_constraints: dict[VarType, list[int]]
+    _unassigned_count: list[int]
+    _unary_constraints: dict[VarType, list[int]]
+    # cost of the unary constraints of a variable for each value, filled when first needed
+    _unary_costs: dict[VarType, dict[Domain, float]]
+    # conflict directed backjumping: the assigned variables that changed each dependent
+    # variable and that caused the values pruned from each domain (both kept on the trail),
+    # the variables that caused the failure of the last assignment and the last wiped out variable
+    _backjumping: bool
+    _dep_writers: dict[Any, frozenset[VarType]]
+    _pruners: dict[VarType, frozenset[VarType]]
+    _culprits: set[VarType]
+    _wiped_var: VarType
+    # nogoods learned from the conflicts, indexed by each of their assignments, and evicted
+    # least recently used first once there are more than _nogood_limit
+    _nogoods: OrderedDict[Nogood, None]
+    _nogood_index: dict[tuple[VarType, Domain], list[Nogood]]
+    _nogood_limit: int
+    # randomized restarts: the runs after the first one try the values in a slightly shuffled
+    # order, keeping the best solution, the weights and the nogoods of the previous runs
+    _restarts: Restarts
+    _restart_base: int
+    _restart_factor: float
+    _randomization: float
+    _random: Random
+    # anytime search: the search stops once it explored _node_budget nodes or
+    # the wall clock reached _deadline (both inf by default), _stopped tells whether it did
+    _node_budget: float
+    _deadline: float
+    _stopped: bool
+    # warm start: the values of a known solution (the incumbent), tried first for every variable
+    _initial: Solution
 
     dependencies: Callable[[VarType, Domain], list[Dependency]]
     dependent_vars: dict[Any, Any] = {}
+    # assignment of a variable to a value can also remove values from the domains of other
+    # variables (only used when propagation is enabled, called after the dependencies are updated)
+    prunings: Callable[[VarType, Domain], list[Pruning[VarType, Domain]]] | None = None
+    # admissible lower bound of the cost an unassigned variable will add given its current domain,
+    # by default the minimum cost of its unary constraints over the domain
+    var_lower_bound: Callable[[VarType, Sequence[Domain]], float] | None = None
+    # cost of assigning a value to a variable on its own, usually looked up in a table compiled
+    # by the model instead of one unary constraint per forbidden value, it is added when the
+    # variable is assigned, the values are tried from the cheapest and it gives the default bounds
+    unary_cost: Callable[[VarType, Domain], float] | None = None
+    # best cost shared with the other processes of a parallel search (a multiprocessing Value),
+    # read every SHARED_COST_PERIOD nodes and written when a better solution is found
+    shared_cost: Any | None = None
 
     def __init__(self):
         self._reset()
@@ -56,112 +184,641 @@ class PCSP(Generic[VarType, Domain]):
         self._best_solution = {}
         self._best_cost = inf
         self._iterations = 0
+        self._trail = []
+        self._bound_delta = 0
+        self._dep_writers = {}
+        self._pruners = {}
+        self._culprits = set()
+        self._nogoods = OrderedDict()
+        self._nogood_index = {}
+        self._stopped = False
+
+    def _compile_constraints(self, variables: ViewList[VarType], constraints: list[Constraint[VarType, Domain]]):
+        self._constraints = constraints
+        self._var_constraints = {var: [] for var in variables}
+        self._unassigned_count = []
+        self._unary_constraints = {var: [] for var in variables}
+        self._unary_costs = {var: {} for var in variables}
+        for i, constraint in enumerate(constraints):
+            # a variable may appear more than once in the list, count it only once
+            constraint_vars = set(constraint[C_VAR_LIST])
+            self._unassigned_count.append(len(constraint_vars))
+            for var in constraint_vars:
+                if var in self._var_constraints: self._var_constraints[var].append(i)
+            if len(constraint_vars) == 1 and constraint[C_COST] < inf:
+                (var,) = constraint_vars
+                if var in self._unary_constraints: self._unary_constraints[var].append(i)
+
+    def _assign_constraints(self, var: VarType, evaluate: bool):
+        """ marks var as assigned in the readiness index and returns the cost of
+            the constraints that just became fully assigned and are not satisfied """
+        cost = 0
+        unassigned_count = self._unassigned_count
+        for i in self._var_constraints[var]:
+            unassigned_count[i] -= 1
+            if evaluate and unassigned_count[i] == 0 and not self._check_constraint(self._constraints[i]):
+                cost += self._constraints[i][C_COST]
+                self._weights[i] += 1
+                if self._backjumping: self._culprits.update(self._constraints[i][C_VAR_LIST])
+        return cost
+
+    def _unassign_constraints(self, var: VarType):
+        for i in self._var_constraints[var]:
+            self._unassigned_count[i] += 1
 
-    def _constraints_for_var(self, var: VarType):
-        return (c for c in self._constraints[var] if
-                all(v in self._solution for v in c[C_VAR_LIST]))
-    
     def _check_constraint(self, constraint: Constraint):
         return constraint[C_RELATION](*[self._solution[var] for var in constraint[C_VAR_LIST]])
     
+    def _prune(self, var: VarType, keep: UnaryPredicate[Domain], reason: Callable[[], frozenset] | None = None) -> bool:
+        """ removes the values not satisfying keep from the domain of an unassigned variable
+            and returns False if the domain was wiped out, reason returns the assigned
+            variables responsible for the pruning """
+        if var in self._solution or var not in self._templates: return True
+        template = self._templates[var]
+        domain = self._domain_sets.get(var)
+        if domain is None: domain = self._domain_sets[var] = SparseSet(len(template))
+        size = len(domain)
+        if domain.filter(keep, template):
+            self._trail.append((domain, var, size))
+            self._update_bound(var)
+            if self._backjumping and reason is not None:
+                self._set(self._pruners, var, self._pruners.get(var, frozenset()) | reason())
+        if not domain:
+            self._var_weights[var] += 1
+            self._wiped_var = var
+        return len(domain) > 0
+
+    def _domain(self, var: VarType) -> list[Domain]:
+        """ the values left in the domain of var, in the order of its template """
+        template = self._templates[var]
+        domain = self._domain_sets.get(var)
+        if domain is None or len(domain) == len(template): return template
+        return domain.select(template)
+
+    def _domain_size(self, var: VarType) -> int:
+        domain = self._domain_sets.get(var)
+        return len(self._templates[var]) if domain is None else len(domain)
+
+    def _assigned_vars(self) -> Iterable[VarType]:
+        return self._solution.keys()
+
+    def _constraint_reason(self, constraint: Constraint, cost: float) -> frozenset[VarType]:
+        """ the assigned variables responsible for pruning with a constraint """
+        if constraint[C_COST] < inf and cost > 0:
+            # the pruning also depends on the cost of the partial solution
+            return frozenset(self._assigned_vars())
+        reason = frozenset(v for v in constraint[C_VAR_LIST] if v in self._solution)
+        for v in constraint[C_VAR_LIST]:
+            if v not in self._solution: reason |= self._pruners.get(v, frozenset())
+        return reason
+
+    def _set(self, container: dict, key: Any, value: Any):
+        self._trail.append((container, key, container.get(key)))
+        container[key] = value
+
+    def _unwind(self, mark: int):
+        trail = self._trail
+        while len(trail) > mark:
+            container, key, old_value = trail.pop()
+            if type(container) is SparseSet: container.restore(old_value)
+            elif old_value is not None: container[key] = old_value
+            else: del container[key]
+
+    def _unary_cost(self, var: VarType, val: Domain) -> float:
+        cost = self.unary_cost(var, val) if self.unary_cost is not None else 0
+        if not self._unary_constraints[var]: return cost
+        costs = self._unary_costs[var]
+        if val not in costs:
+            self._solution[var] = val
+            costs[val] = sum(self._constraints[i][C_COST] for i in self._unary_constraints[var]
+                             if not self._check_constraint(self._constraints[i]))
+            del self._solution[var]
+        return cost + costs[val]
+
+    def _has_unary_cost(self, var: VarType) -> bool:
+        return self.unary_cost is not None or len(self._unary_constraints[var]) > 0
+
+    def _min_unary_cost(self, var: VarType, domain: Iterable[Domain]) -> float:
+        if not self._has_unary_cost(var): return 0
+        min_cost = inf
+        for val in domain:
+            min_cost = min(min_cost, self._unary_cost(var, val))
+            if min_cost == 0: break
+        return min_cost
+
+    def _var_bound(self, var: VarType) -> float:
+        if self.var_lower_bound is not None: return self.var_lower_bound(var, self._domain(var))
+        template = self._templates[var]
+        domain = self._domain_sets.get(var)
+        if domain is None: return self._min_unary_cost(var, template)
+        return self._min_unary_cost(var, (template[i] for i in domain))
+
+    def _update_bound(self, var: VarType):
+        if var not in self._bounds or (self.var_lower_bound is None and not self._has_unary_cost(var)):
+            return
+        old_bound = self._bounds[var]
+        self._set(self._bounds, var, self._var_bound(var))
+        self._bound_delta += self._bounds[var] - old_bound
+
+    def _is_promising(self, cost: float) -> bool:
+        return cost < self._best_cost and cost <= self._max_cost
+
+    def _can_prune(self, constraint: Constraint, cost: float) -> bool:
+        # violating a constraint is only forbidden if the solution can not be better anymore
+        return not self._is_promising(cost + constraint[C_COST])
+
+    def _revise(self, constraint: Constraint, var: VarType, cost: float) -> tuple[bool, bool]:
+        """ removes the values of var that have no support in the domains of the other
+            unassigned variables of the constraint, returns (not wiped out, changed) """
+        var_list = constraint[C_VAR_LIST]
+        others = [v for v in set(var_list) if v != var and v not in self._solution]
+        def supported(val: Domain):
+            self._solution[var] = val
+            try:
+                if not others: return self._check_constraint(constraint)
+                for others_vals in product(*(self._domain(v) for v in others)):
+                    self._solution.update(zip(others, others_vals))
+                    if self._check_constraint(constraint): return True
+                return False
+            finally:
+                for v in others: self._solution.pop(v, None)
+                del self._solution[var]
+        mark = len(self._trail)
+        reason = lambda: self._constraint_reason(constraint, cost)
+        return self._prune(var, supported, reason), len(self._trail) != mark
+
+    def _ac3(self, queue: deque[int], cost: float) -> bool:
+        queued = set(queue)
+        while queue:
+            i = queue.popleft()
+            queued.discard(i)
+            constraint = self._constraints[i]
+            for var in set(constraint[C_VAR_LIST]):
+                if var in self._solution: continue
+                consistent, changed = self._revise(constraint, var, cost)
+                if not consistent: return False
+                if not changed: continue
+                for j in self._var_constraints[var]:
+                    if j != i and j not in queued and self._arc_constraint(j, cost):
+                        queue.append(j)
+                        queued.add(j)
+        return True
+
+    def _arc_constraint(self, i: int, cost: float) -> bool:
+        # binary and ternary constraints with at least two unassigned variables
+        return 2 <= self._unassigned_count[i] and len(self._constraints[i][C_VAR_LIST]) <= 3 and \
+               self._can_prune(self._constraints[i], cost)
+
+    def _propagate(self, var: VarType, val: Domain, cost: float) -> bool:
+        """ prunes the domains of the unassigned variables after var was assigned val,
+            returns False if a domain was wiped out """
+        if self._propagation == 'none': return True
+        mark = len(self._trail)
+        if self.prunings is not None:
+            for pruning in self.prunings(var, val) or []:
+                prune_vars, keep = pruning[0], pruning[1]
+                reason = lambda: frozenset((var,)) | \
+                    (self._dep_writers.get(pruning[2], frozenset()) if len(pruning) > 2 else frozenset())
+                for prune_var in prune_vars:
+                    if not self._prune(prune_var, keep, reason): return False
+        for i in self._var_constraints[var]:
+            if self._unassigned_count[i] != 1 or not self._can_prune(self._constraints[i], cost): continue
+            last_var = next(v for v in self._constraints[i][C_VAR_LIST] if v not in self._solution)
+            if not self._revise(self._constraints[i], last_var, cost)[0]: return False
+        if self._propagation == 'ac3':
+            pruned_vars = {key for container, key, _ in self._trail[mark:] if type(container) is SparseSet}
+            return self._ac3(deque({i for v in pruned_vars for i in self._var_constraints.get(v, [])
+                                    if self._arc_constraint(i, cost)}), cost)
+        return True
+
+    def _propagate_root(self) -> bool:
+        """ node consistency for the unary constraints and arc consistency before the search """
+        if self._propagation == 'none': return True
+        # the unary costs were already used to prune the domain templates
+        if self.unary_cost is not None and not all(self._templates[var] for var in self._variables):
+            return False
+        for i, constraint in enumerate(self._constraints):
+            if self._unassigned_count[i] != 1 or not self._can_prune(constraint, 0): continue
+            if not self._revise(constraint, constraint[C_VAR_LIST][0], 0)[0]: return False
+        if self._propagation == 'ac3':
+            return self._ac3(deque(i for i in range(len(self._constraints))
+                                   if self._arc_constraint(i, 0)), 0)
+        return True
+
+    def _degree(self, var: VarType) -> int:
+        return sum(1 for i in self._var_constraints[var] if self._unassigned_count[i] >= 2)
+
+    def _weighted_degree(self, var: VarType) -> int:
+        return self._var_weights[var] + \
+            sum(self._weights[i] for i in self._var_constraints[var] if self._unassigned_count[i] >= 2)
+
+    def _select_var(self, depth: int) -> VarType:
+        """ moves the next variable to branch on at position depth and returns it """
+        variables = self._variables
+        if self._order == 'static': return variables[depth]
+        best, best_key = depth, inf
+        for i in range(depth, len(variables)):
+            key = self._var_key(variables[i])
+            if key < best_key: best, best_key = i, key
+        variables[depth], variables[best] = variables[best], variables[depth]
+        return variables[depth]
+
+    def _var_key(self, var: VarType) -> float:
+        # the variable with the smallest key is the next one to branch on
+        if self._order == 'mrv': return self._domain_size(var)
+        if self._order == 'degree': return -self._degree(var)
+        return self._domain_size(var) / self._weighted_degree(var)
+
     def _update_deps(self, var: VarType, val: Domain):
         log(f"\t[dependencies] {var} -> {val}")
         dep_cost = 0
-        dep_updates: list[tuple[VarType, Any | None]] = []
         dependecies = self.dependencies(var, val)
-        if dependecies is None: return (0, lambda: None)
+        if dependecies is None: return 0
         for dep_var, update, update_cost in dependecies:
-            old_dep_val = self.dependent_vars.get(dep_var)
-            new_dep_val, success = update(old_dep_val)
-            self.dependent_vars[dep_var] = new_dep_val
-            dep_updates.append((dep_var, old_dep_val))
+            new_dep_val, success = update(self.dependent_vars.get(dep_var), var, val)
+            self._set(self.dependent_vars, dep_var, new_dep_val)
+            if self._backjumping:
+                writers = self._dep_writers.get(dep_var, frozenset())
+                if not success: self._culprits.update(writers)
+                self._set(self._dep_writers, dep_var, writers | {var})
             if not success:
                 log(f"\tfailed update for {dep_var}, cost: {update_cost}")
                 dep_cost += update_cost
-                continue
+        return dep_cost
 
-        def revert():
-            for dep_var, old_dep_val in dep_updates:
-                if old_dep_val is not None: self.dependent_vars[dep_var] = old_dep_val
-                else: del self.dependent_vars[dep_var]
-
-        return dep_cost, revert
-
-    def _PCSP(self, variables: ViewList[VarType], cost: float):
-        if cost == inf:
-            # if cost is infinite, we did not satisfy a mandatory constraint
-            log(f"[exit] infinite cost")
-            return False
-
-        if not variables:
-            # We reached a new best solution
-            log(f"new best solution, {self._solution} cost: {cost}")
-            self._best_solution = self._solution
-            self._best_cost = cost
-            if cost <= self._acceptable_cost:
-                log(f"[exit] new best solution is acceptable, exit true")
-                return True
-            else:
-                log(f"[exit] new best solution is not acceptable, exit false")
-                return False
-        elif cost == self._best_cost:
-            # current solution is not better than the best known solution
-            log(f"[exit] cost is equal to best cost, exit false")
-            return False
-            
-        for val in self._domains[variables[0]]:
-            # try values for the current variable
-            if self._PSCP_val(variables, val, cost):
-                return True
-            elif cost == self._best_cost:
-                return False
-        
-        # no more values to try for the current variable
-        return False
-        
-    def _PSCP_val(self, variables: ViewList[VarType], val: Domain, cost: float):
-        # get the current variable and first available value for it
-        var = variables[0]
+    def _assign(self, frame: _Frame, val: Domain) -> float:
+        """ assigns val to the variable of the frame and returns the cost of the new node """
+        var = frame.var
         self._iterations += 1
         log(f"Trying {var} -> {val}")
-
-        # to avoid copying the solution, I will apply an update/revert strategy
-        old_val = self._solution.get(var)
-        self._solution[var] = val
+        frame.assigned = True
+        frame.trail_mark = len(self._trail)
+        self._bound_delta = 0
+        self._culprits.clear()
+        self._set(self._solution, var, val)
 
         # check if the current value satisfies the dependencies
         log(self.dependent_vars)
-        dep_cost, revert_dep = self._update_deps(var, val)
-        new_cost = cost
+        dep_cost = self._update_deps(var, val)
         log(f"dependent cost: {dep_cost}")
 
-        if dep_cost < inf:
-            evaluable_constraints = self._constraints_for_var(var)
-            # log(f"|evaluable_constraints|: {len(list(evaluable_constraints))}")
-            new_cost += sum(map(lambda c: c[C_COST], 
-                                filter(lambda c: not self._check_constraint(c), 
-                                        evaluable_constraints)))
-            log(f"evaluated constraints with cost: {new_cost - cost}")
+        # the readiness index has to be kept up to date even if the dependencies failed
+        constraints_cost = self._assign_constraints(var, evaluate=dep_cost < inf)
+        if self.unary_cost is not None and dep_cost < inf:
+            unary_cost = self.unary_cost(var, val)
+            if unary_cost > 0 and self._backjumping: self._culprits.add(var)
+            constraints_cost += unary_cost
+        log(f"evaluated constraints with cost: {constraints_cost}")
 
-        new_cost += dep_cost
+        new_cost = frame.cost + constraints_cost + dep_cost
         log(f"added dependent cost, new cost: {new_cost}")
+        if new_cost < inf and self._violates_nogood(var, val):
+            new_cost = inf
+        if new_cost == inf: self._var_weights[var] += 1
+        return new_cost
 
-        if new_cost < self._best_cost and new_cost <= self._acceptable_cost:
-            log(f"new best acceptable cost. Trying next variable")
-            if self._PCSP(variables[1:], new_cost):
-                log(f"[exit] partial solution found, exit true")
+    def _violates_nogood(self, var: VarType, val: Domain) -> bool:
+        for nogood in self._nogood_index.get((var, val), ()):
+            if all(v in self._solution and self._solution[v] == w for v, w in nogood):
+                log(f"nogood {nogood} violated")
+                self._nogoods.move_to_end(nogood)
+                self._culprits.update(v for v, _ in nogood)
                 return True
-        log(f"Trying next value for {var}")
-        # revert the solution and dependent variables
-        if old_val is not None: self._solution[var] = old_val
-        else: del self._solution[var]
-        revert_dep()
-        
-    def solve(self, variables: ViewList[VarType], domains: dict[VarType, ViewList[Domain]], 
-              constraints: list[Constraint[VarType, Domain]], acceptable_cost: float):
+        return False
+
+    def _learn_nogood(self, conflicts: set[VarType]):
+        nogood = frozenset((v, self._solution[v]) for v in conflicts)
+        if nogood in self._nogoods: return
+        self._nogoods[nogood] = None
+        for assignment in nogood:
+            self._nogood_index.setdefault(assignment, []).append(nogood)
+        if len(self._nogoods) > self._nogood_limit:
+            evicted, _ = self._nogoods.popitem(last=False)
+            for assignment in evicted:
+                self._nogood_index[assignment].remove(evicted)
+
+    def _add_conflicts(self, frame: _Frame, culprits: Iterable[VarType]):
+        if not self._backjumping: return
+        frame.conflicts.update(culprits)
+        frame.conflicts.discard(frame.var)
+
+    def _backjump(self, stack: list[_Frame], conflicts: set[VarType]) -> bool:
+        """ backtracks to the deepest variable of the conflict set of an exhausted variable,
+            returns False if no variable in the conflict set is left, so there is no solution """
+        if not stack or not conflicts: return False
+        if self._nogood_limit > 0 and len(conflicts) < len(stack):
+            self._learn_nogood(conflicts)
+        while stack and stack[-1].var not in conflicts:
+            log(f"backjump over {stack[-1].var}")
+            self._unassign(stack.pop())
+        if not stack: return False
+        self._add_conflicts(stack[-1], conflicts)
+        return True
+
+    def _unassign(self, frame: _Frame):
+        # revert the solution, dependent variables and pruned domains
+        log(f"Trying next value for {frame.var}")
+        self._unassign_constraints(frame.var)
+        self._unwind(frame.trail_mark)
+        frame.assigned = False
+
+    def _values(self, var: VarType, randomize: bool) -> list[Domain]:
+        """ the values of var in the order they are tried, when randomizing each value
+            is swapped with a later one with probability _randomization, so the given
+            order (usually the most promising values first) is mostly kept """
+        values = self._domain(var)
+        if randomize and self._randomization > 0:
+            values = list(values)
+            for i in range(len(values) - 1):
+                if self._random.random() < self._randomization:
+                    j = self._random.randrange(i + 1, len(values))
+                    values[i], values[j] = values[j], values[i]
+        if var in self._initial:
+            val = self._initial[var]
+            if values and values[0] != val and val in values:
+                values = [val] + [other for other in values if other != val]
+        return values
+
+    def _restart_limit(self, run: int) -> int | None:
+        """ the number of nodes the run-th run (counting from 1) may explore """
+        if self._restarts == 'luby': return self._restart_base * luby(run)
+        if self._restarts == 'geometric': return int(self._restart_base * self._restart_factor ** (run - 1))
+        return None
+
+    def _out_of_budget(self) -> bool:
+        if self._iterations >= self._node_budget or perf_counter() >= self._deadline:
+            self._stopped = True
+        if self.shared_cost is not None and self._iterations % SHARED_COST_PERIOD == 0:
+            self._best_cost = min(self._best_cost, self.shared_cost.value)
+            # another process found an acceptable solution
+            if self._best_cost <= self._acceptable_cost: self._stopped = True
+        return self._stopped
+
+    def _share_cost(self, cost: float):
+        if self.shared_cost is None: return
+        with self.shared_cost.get_lock():
+            if cost < self.shared_cost.value: self.shared_cost.value = cost
+
+    def _PCSP(self, node_limit: int | None = None, randomize: bool = False) -> Generator[Incumbent, None, bool | None]:
+        """ depth first branch and bound with an explicit stack of frames, one for each
+            assigned variable, yields every new best solution with its cost and the iterations
+            so far, returns True if an acceptable solution was found, False if the search space
+            was exhausted or the budget ran out and None if it stopped after node_limit nodes """
+        stack: list[_Frame] = []
+        depth, cost = 0, 0
+        bound = sum(self._bounds.values())
+        stop = inf if node_limit is None else self._iterations + node_limit
+        while True:
+            if self._out_of_budget() or self._iterations >= stop:
+                log(f"[stop] node limit or budget reached after {self._iterations} iterations")
+                while stack:
+                    frame = stack.pop()
+                    if frame.assigned: self._unassign(frame)
+                return False if self._stopped else None
+            # enter the node at the current depth
+            if depth == len(self._variables):
+                # We reached a new best solution
+                log(f"new best solution, {self._solution} cost: {cost}")
+                # the solution is changed in place when backtracking, keep a copy
+                self._best_solution = dict(self._solution)
+                self._best_cost = cost
+                self._share_cost(cost)
+                yield dict(self._best_solution), cost, self._iterations
+                if cost <= self._acceptable_cost:
+                    log(f"[exit] new best solution is acceptable, exit true")
+                    return True
+                log(f"new best solution is not acceptable, backtrack")
+                # the next failures depend on the cost of this solution, backtrack chronologically
+                for i, frame in enumerate(stack):
+                    self._add_conflicts(frame, self._variables[:i])
+            elif not self._is_promising(cost + bound):
+                # current solution can not get better than the best known solution
+                log(f"cost is not better than best cost, backtrack")
+                if stack: self._add_conflicts(stack[-1], self._assigned_vars())
+            else:
+                var = self._select_var(depth)
+                stack.append(_Frame(var, self._values(var, randomize), cost, bound))
+
+            # find the deepest frame that still has values to try
+            while stack:
+                frame = stack[-1]
+                if frame.assigned: self._unassign(frame)
+                if frame.index == len(frame.values) or not self._is_promising(frame.cost + frame.bound):
+                    # no more values to try for the current variable
+                    stack.pop()
+                    if not self._backjumping: continue
+                    if frame.index < len(frame.values): frame.conflicts.update(self._assigned_vars())
+                    # the values propagation removed before the frame was built failed too
+                    frame.conflicts |= self._pruners.get(frame.var, frozenset())
+                    if not self._backjump(stack, frame.conflicts): return False
+                    continue
+                val = frame.values[frame.index]
+                frame.index += 1
+                new_cost = self._assign(frame, val)
+                # bound of the variables left unassigned, before and after propagation
+                new_bound = frame.bound - self._bounds[frame.var]
+                if not self._is_promising(new_cost + new_bound):
+                    # the failure only depends on the culprits if it is not caused by earlier costs
+                    hard = new_cost == inf or (frame.cost == 0 and new_bound == 0)
+                    self._add_conflicts(frame, self._culprits if hard else self._assigned_vars())
+                    continue
+                if not self._propagate(frame.var, val, new_cost):
+                    log(f"domain wipe out after propagation")
+                    self._add_conflicts(frame, self._pruners.get(self._wiped_var, frozenset()))
+                    continue
+                new_bound += self._bound_delta
+                if self._is_promising(new_cost + new_bound):
+                    log(f"new best acceptable cost. Trying next variable")
+                    depth, cost, bound = len(stack), new_cost, new_bound
+                    break
+                self._add_conflicts(frame, self._assigned_vars())
+            else:
+                return False
+
+    def _setup(self, variables: ViewList[VarType], domains: dict[VarType, ViewList[Domain]],
+               constraints: list[Constraint[VarType, Domain]], acceptable_cost: float,
+               propagation: Propagation = 'none', order: VarOrder = 'static',
+               max_cost: float | None = None, backjumping: bool = False, nogood_limit: int = 0,
+               restarts: Restarts = 'none', restart_base: int = 100, restart_factor: float = 1.5,
+               randomization: float = 0.1, seed: int | None = None,
+               time_limit: float | None = None, node_limit: int | None = None,
+               incumbent: tuple[Solution, float] | None = None):
+        """ prepares a search with the options of solve and solutions """
         self._reset()
-        self._domains = deepcopy(domains)
+        self._initial = {}
+        if incumbent is not None:
+            self._initial = incumbent[0]
+            self._best_solution, self._best_cost = dict(incumbent[0]), incumbent[1]
+        self._variables = list(variables)
+        self._order = order
         self._acceptable_cost = acceptable_cost
-        self._constraints = {var: [c for c in constraints if var in c[C_VAR_LIST]] for var in variables}
-        self._PCSP(variables, 0)
+        self._max_cost = acceptable_cost if max_cost is None else max_cost
+        # the templates are never changed (the domains are pruned in the sparse sets)
+        # so variables given the same domain object share one list, and with unary costs also
+        # one sorted list for every cost signature (the costs of the values, in the given order)
+        templates: dict[tuple, list[Domain]] = {}
+        interned: dict[tuple[Domain, ...], list[Domain]] = {}
+        def template(var: VarType, domain: Sequence[Domain]) -> list[Domain]:
+            costs = () if self.unary_cost is None else tuple(self.unary_cost(var, val) for val in domain)
+            key = (id(domain), costs)
+            if key not in templates:
+                values = list(domain)
+                if costs:
+                    # the cheapest values first, keeping the given order between values of the same cost,
+                    # with propagation the values too expensive on their own are pruned (node consistency)
+                    cheapest = sorted(range(len(values)), key=costs.__getitem__)
+                    values = [values[i] for i in cheapest
+                              if propagation == 'none' or self._is_promising(costs[i])]
+                # different signatures may still give the same list
+                templates[key] = interned.setdefault(tuple(values), values)
+            return templates[key]
+        self._templates = {var: template(var, domain) for var, domain in domains.items()}
+        self._domain_sets = {}
+        self._propagation = propagation
+        self._backjumping = backjumping
+        self._nogood_limit = nogood_limit if backjumping else 0
+        self._compile_constraints(variables, constraints)
+        self._weights = [1] * len(constraints)
+        self._var_weights = {var: 1 for var in variables}
+        self._bounds = {var: self._var_bound(var) for var in variables}
+        self._restarts = restarts
+        self._restart_base = restart_base
+        self._restart_factor = restart_factor
+        self._randomization = randomization
+        self._random = Random(seed)
+        self._node_budget = inf if node_limit is None else node_limit
+        self._deadline = inf if time_limit is None else perf_counter() + time_limit
+
+    def solutions(self, variables: ViewList[VarType], domains: dict[VarType, ViewList[Domain]],
+                  constraints: list[Constraint[VarType, Domain]], acceptable_cost: float,
+                  **options) -> Iterator[Incumbent]:
+        """ anytime version of solve, yields (solution, cost, iterations) for every improved
+            solution, each solution is a copy that is not changed by the search afterwards,
+            the search stops after time_limit seconds or node_limit nodes """
+        self._setup(variables, domains, constraints, acceptable_cost, **options)
+        try:
+            # the incumbent may already be acceptable
+            if self._best_cost > acceptable_cost and self._propagate_root():
+                run = 1
+                # the node limits grow without bound, so some run eventually finishes the search
+                while (yield from self._PCSP(self._restart_limit(run), randomize=run > 1)) is None:
+                    run += 1
+                log(f"search finished after {run} runs")
+        finally:
+            # leave the dependent variables as they were, so the same instance can solve again
+            self._unwind(0)
+
+    def solve(self, variables: ViewList[VarType], domains: dict[VarType, ViewList[Domain]],
+              constraints: list[Constraint[VarType, Domain]], acceptable_cost: float,
+              on_solution: Callable[[Solution, float, int], None] | None = None, **options):
+        """ searches for a solution costing at most acceptable_cost, using branch and bound over
+            the partial solutions costing at most max_cost (by default the acceptable cost),
+            with backjumping at most nogood_limit nogoods are learned from the conflicts,
+            with restarts the search is restarted after a number of nodes given by the
+            schedule (in units of restart_base) until a run finishes, on_solution is called
+            with every improved solution, with an incumbent (a solution and its cost) only better
+            solutions are searched, trying its values first, see _setup for the other options """
+        for solution, cost, iterations in self.solutions(variables, domains, constraints, acceptable_cost, **options):
+            if on_solution: on_solution(solution, cost, iterations)
         return self._best_solution, self._best_cost, self._iterations
+
+    def evaluate(self, variables: ViewList[VarType], constraints: list[Constraint[VarType, Domain]],
+                 solution: Solution) -> float:
+        """ the cost of a complete solution (inf if it breaks a hard constraint or dependency),
+            found by a search where every variable has its value in the solution as its only one """
+        domains = {var: [solution[var]] for var in variables}
+        self.solve(variables, domains, constraints, acceptable_cost=0, max_cost=inf)
+        return self._best_cost
+
+    def _frontier(self, split: int, depth: int, cost: float, bound: float) -> Iterator[list[tuple[VarType, Domain]]]:
+        if depth == split or depth == len(self._variables):
+            yield [(var, self._solution[var]) for var in self._variables[:depth]]
+            return
+        var = self._select_var(depth)
+        frame = _Frame(var, self._domain(var), cost, bound)
+        for val in frame.values:
+            new_cost = self._assign(frame, val)
+            new_bound = bound - self._bounds[var]
+            if self._is_promising(new_cost + new_bound) and self._propagate(var, val, new_cost):
+                new_bound += self._bound_delta
+                if self._is_promising(new_cost + new_bound):
+                    yield from self._frontier(split, depth + 1, new_cost, new_bound)
+            self._unassign(frame)
+
+    def split(self, variables: ViewList[VarType], domains: dict[VarType, ViewList[Domain]],
+              constraints: list[Constraint[VarType, Domain]], acceptable_cost: float,
+              split: int, **options) -> list[list[tuple[VarType, Domain]]]:
+        """ the assignments of the first split variables (chosen by the variable ordering)
+            that survive propagation, the subtrees below them cover the whole search """
+        self._setup(variables, domains, constraints, acceptable_cost, **options)
+        try:
+            if not self._propagate_root(): return []
+            return list(self._frontier(split, 0, 0, sum(self._bounds.values())))
+        finally:
+            self._unwind(0)
+
+
+# parallel search: every worker process builds its own instance of the problem once,
+# since the constraints and the hooks are usually closures that can not be pickled
+type Problem[VarType, Domain] = tuple[PCSP[VarType, Domain], Sequence[VarType],
+                                      dict[VarType, Sequence[Domain]], list[Constraint[VarType, Domain]]]
+_worker_problem: Problem | None = None
+
+def _init_worker(build: Callable[[], Problem], shared_cost):
+    global _worker_problem
+    _worker_problem = build()
+    _worker_problem[0].shared_cost = shared_cost
+
+def _solve_unit(prefix: list[tuple[Any, Any]], acceptable_cost: float,
+                deadline: float | None, options: dict[str, Any]):
+    """ solves the subtree where the first variables take the values in prefix,
+        returns the best solution found (if any), its cost and the iterations """
+    pcsp, variables, domains, constraints = cast(Problem, _worker_problem)
+    if deadline is not None:
+        options = options | {'time_limit': deadline - time()}
+        if options['time_limit'] <= 0: return {}, inf, 0
+    fixed = dict(prefix)
+    variables = list(fixed) + [var for var in variables if var not in fixed]
+    domains = domains | {var: [val] for var, val in fixed.items()}
+    best_solution, best_cost = {}, inf
+    for best_solution, best_cost, _ in pcsp.solutions(variables, domains, constraints, acceptable_cost, **options):
+        pass
+    return best_solution, best_cost, pcsp._iterations
+
+def solve_parallel(build: Callable[[], Problem[VarType, Domain]], acceptable_cost: float,
+                   split: int = 1, workers: int | None = None,
+                   on_solution: Callable[[dict[VarType, Domain], float, int], None] | None = None,
+                   time_limit: float | None = None, **options):
+    """ splits the search on the values of the first split variables into work units solved
+        by a pool of worker processes, which share the best cost to prune their subtrees,
+        build must be picklable (a module level function or a partial of one) and return
+        (pcsp, variables, domains, constraints), node_limit applies to every work unit,
+        returns (best_solution, best_cost, iterations) like PCSP.solve """
+    pcsp, variables, domains, constraints = build()
+    units = pcsp.split(variables, domains, constraints, acceptable_cost, split,
+                       **{key: val for key, val in options.items() if key != 'node_limit'})
+    deadline = None if time_limit is None else time() + time_limit
+    workers = workers or cpu_count() or 1
+    # the units only search for solutions better than the incumbent, which is the result if none is found
+    best_solution, best_cost = options.get('incumbent') or ({}, inf)
+    shared_cost = Value('d', best_cost)
+    # the nodes of the split count with the ones of the units
+    iterations = pcsp._iterations
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(build, shared_cost)) as executor:
+        # only as many units as workers are submitted at a time, the rest are never started
+        # once an acceptable solution is found, while the running ones stop on the shared cost
+        pending = iter(units)
+        submit = lambda unit: executor.submit(_solve_unit, unit, acceptable_cost, deadline, options)
+        running = {submit(unit) for unit in islice(pending, workers)}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                solution, cost, unit_iterations = future.result()
+                iterations += unit_iterations
+                if cost < best_cost:
+                    best_solution, best_cost = solution, cost
+                    log(f"[parallel] new best cost {cost}")
+                    if on_solution: on_solution(solution, cost, iterations)
+            if best_cost <= acceptable_cost: break
+            running |= {submit(unit) for unit in islice(pending, len(done))}
+    return best_solution, best_cost, iterations
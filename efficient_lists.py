@@ -1,9 +1,10 @@
 """ This module exists firstly because numpy's typing was annoying me and
     secondly to test different implementations for an efficient list allowing
-    O(1) insert and remove from front immutably """
+    O(1) insert and remove from front immutably (ViewList) and O(1) remove and
+    restore when backtracking (SparseSet) """
 from __future__ import annotations
 from copy import deepcopy
-from typing import Generic, TypeVar, overload
+from typing import Callable, Generic, Sequence, TypeVar, overload
 
 T = TypeVar('T')
 
@@ -59,3 +60,75 @@ class ViewList(Generic[T]):
     
     def __deepcopy__(self, memo):
         return ViewList([deepcopy(self._lst[i]) for i in range(self._start, self._end)])
+
+
+
+class SparseSet:
+    """ A subset of the integers 0..n-1 (usually indices in a list of values) with O(1)
+        membership, remove and restore. The members are _dense[:_size], removing one swaps it
+        right after them, so the values removed after a size marker (see size) come back by
+        restoring the marker, as long as it is done in LIFO order (like when backtracking) """
+    __slots__ = ('_dense', '_pos', '_size')
+    _dense: list[int]
+    _pos: list[int]
+    _size: int
+
+    def __init__(self, n: int):
+        self._dense = list(range(n))
+        self._pos = list(range(n))
+        self._size = n
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def remove(self, i: int):
+        pos = self._pos
+        at = pos[i]
+        if at >= self._size: return
+        last = self._size - 1
+        other = self._dense[last]
+        self._dense[at], self._dense[last] = other, i
+        pos[other], pos[i] = at, last
+        self._size = last
+
+    def filter(self, keep: Callable[[T], bool], values: Sequence[T]) -> int:
+        """ removes the members i for which values[i] does not satisfy keep,
+            returns the number of removed members """
+        old_size = size = self._size
+        dense, pos = self._dense, self._pos
+        # backwards, so the members swapped in place of the removed ones were already kept
+        for at in range(old_size - 1, -1, -1):
+            i = dense[at]
+            if keep(values[i]): continue
+            size -= 1
+            other = dense[size]
+            dense[at], dense[size] = other, i
+            pos[other], pos[i] = at, size
+        self._size = size
+        return old_size - size
+
+    def restore(self, size: int):
+        """ adds back the members removed since the set had the given size """
+        self._size = size
+
+    def select(self, values: Sequence[T]) -> list[T]:
+        """ the values[i] of the members i, in the order of values (the iteration order
+            changes with removals), by a scan of the positions instead of sorting the members """
+        size = self._size
+        # propagation leaves most domains with a single value, found without a scan
+        if size == 1: return [values[self._dense[0]]]
+        return [value for value, at in zip(values, self._pos) if at < size]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, i: int) -> bool:
+        return 0 <= i < len(self._pos) and self._pos[i] < self._size
+
+    def __iter__(self):
+        for at in range(self._size):
+            yield self._dense[at]
+
+    def __repr__(self):
+        return f'{self._dense[:self._size]}'
@@ -1,9 +1,17 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from copy import copy
-from itertools import tee
-from math import inf
+from itertools import islice
+from math import exp, inf
+from multiprocessing import Value
+from os import cpu_count
+from time import perf_counter
 import random
-from typing import Generator, TypeVar, cast
+from typing import Any, Callable, Generator, Hashable, Iterable, Literal, TypeVar, cast, override
+
+type Improvement = Literal['first', 'best']
+# actions evaluated together by _evaluate_actions when all of them are needed (best improvement, tabu)
+BATCH_SIZE = 4096
 
 DEBUG = False
 def dlog(*args, **kwargs):
@@ -17,9 +25,20 @@ class HillClimbing[Sol, Action](ABC):
     _solution: Sol
     _cost: float
     _max_iter: int
+    # take the first improving action or the best of all the generated ones
+    _improvement: Improvement
+    # seconds a solve may take, checked between steps (None for no limit), and its end
+    _time_limit: float | None
+    _deadline: float = inf
+
+    # set by solve_parallel to a multiprocessing Value shared by the workers, which
+    # becomes 1 once one of them found a solution of cost 0 and the others stop
+    shared_stop: Any | None = None
 
-    def __init__(self, max_iter: int):
+    def __init__(self, max_iter: int, improvement: Improvement = 'first', time_limit: float | None = None):
         self._max_iter = max_iter
+        self._improvement = improvement
+        self._time_limit = time_limit
 
     @abstractmethod
     def _generate_initial_solution(self) -> Sol:
@@ -38,6 +57,10 @@ class HillClimbing[Sol, Action](ABC):
         """ Returns the delta of the cost function if the action is applied. """
         pass
 
+    def _evaluate_actions(self, actions: list[Action]) -> list[float]:
+        """ Returns the deltas of a batch of actions, without applying any of them. """
+        return [self._evaluate_action(action) for action in actions]
+
     @abstractmethod
     def _apply_action(self, action: Action) -> None:
         pass
@@ -50,42 +73,195 @@ class HillClimbing[Sol, Action](ABC):
         self._best_solution = None
         self._best_cost = inf
 
+    def _stop_requested(self) -> bool:
+        return perf_counter() >= self._deadline or (self.shared_stop is not None and self.shared_stop.value == 1)
+
+    def _next_action(self) -> tuple[Action | None, float, Action | None, float]:
+        """ returns the improving action to apply (None if there is none) with its delta, and the
+            first generated action with its delta, taken when a worse action is allowed """
+        first, first_delta = None, 0
+        best, best_delta = None, 0
+        if self._improvement == 'best':
+            # every action is evaluated anyway, a batch at a time
+            actions = self._generate_actions()
+            while batch := list(islice(actions, BATCH_SIZE)):
+                deltas = self._evaluate_actions(batch)
+                if first is None: first, first_delta = batch[0], deltas[0]
+                delta = min(deltas)
+                if delta < best_delta: best, best_delta = batch[deltas.index(delta)], delta
+            return best, best_delta, first, first_delta
+        for action in self._generate_actions():
+            delta = self._evaluate_action(action)
+            if first is None: first, first_delta = action, delta
+            if delta < 0: return action, delta, first, first_delta
+        return best, best_delta, first, first_delta
+
+    def _record_best(self) -> None:
+        if self._cost < self._best_cost:
+            dlog("New best cost found")
+            self._best_cost = self._cost
+            self._best_solution = copy(self._solution)
+
+    def _climb(self) -> None:
+        """ searches from the current solution until the restart ends, recording the best solution """
+        while not self._stop_requested():
+            action, delta, first, first_delta = self._next_action()
+            if not action:
+                dlog("No better actions")
+                self._record_best()
+
+                if self._best_cost != 0 and random.random() > 0.5:
+                    dlog("Allowing worse action")
+                    if first is None:
+                        break
+                    action, delta = first, first_delta
+                else: 
+                    break
+            self._apply_action(action)
+            self._cost += delta
+            dlog(f"{delta=} new cost={self._cost}")
+            if self._cost == 0:
+                self._record_best()
+                break
+
     def solve(self) -> Sol:
         self._reset()
+        self._deadline = inf if self._time_limit is None else perf_counter() + self._time_limit
         for _ in range(self._max_iter):
+            if self._stop_requested(): break
             self._restart()
             self._solution = self._generate_initial_solution()
             self._cost = self._evaluate(self._solution)
             dlog(f"Initial cost: {self._cost}")
-            while True:
-                actions, actions_copy = tee(self._generate_actions())
-                better_actions = ((a, delta) for a in actions if (delta := self._evaluate_action(a)) < 0)
-                action, delta = next(better_actions, (None, 0))
-                if not action:
-                    dlog("No better actions")
-                    if self._cost < self._best_cost:
-                        dlog("New best cost found")
-                        self._best_cost = self._cost
-                        self._best_solution = copy(self._solution)
-
-                    if self._best_cost != 0 and random.random() > 0.5:
-                        dlog("Allowing worse action")
-                        action = next(actions_copy, None)
-                        if action is None:
-                            break
-                        delta = self._evaluate_action(action)
-                    else: 
-                        break
-                self._apply_action(action)
-                self._cost += delta
-                dlog(f"{delta=} new cost={self._cost}")
-                if self._cost == 0:
-                    self._best_solution = copy(self._solution)
-                    self._best_cost = 0
-                    break
-
+            self._climb()
             if self._best_cost == 0:
                 break
 
+        if self._best_cost == 0 and self.shared_stop is not None:
+            self.shared_stop.value = 1
         self._best_solution = cast(Sol, self._best_solution)
-        return self._best_solution
\ No newline at end of file
+        return self._best_solution
+
+
+class SimulatedAnnealing[Sol, Action](HillClimbing[Sol, Action]):
+    """ takes the generated actions in order, always applying the improving ones and the worse ones
+        with probability exp(-delta / temperature), the temperature starts at temperature and is
+        multiplied by cooling after every action until it falls below min_temperature """
+    _temperature: float
+    _cooling: float
+    _min_temperature: float
+
+    def __init__(self, max_iter: int, improvement: Improvement = 'first', time_limit: float | None = None,
+                 temperature: float = 10, cooling: float = 0.9999, min_temperature: float = 1):
+        super().__init__(max_iter, improvement, time_limit)
+        self._temperature = temperature
+        self._cooling = cooling
+        self._min_temperature = min_temperature
+
+    @override
+    def _climb(self) -> None:
+        # the starting solution may already be the best one (a warm start)
+        self._record_best()
+        if self._cost == 0: return
+        temperature = self._temperature
+        while temperature > self._min_temperature and not self._stop_requested():
+            generated = False
+            for action in self._generate_actions():
+                generated = True
+                delta = self._evaluate_action(action)
+                if delta < 0 or random.random() < exp(-delta / temperature):
+                    self._apply_action(action)
+                    self._cost += delta
+                    self._record_best()
+                    if self._cost == 0: return
+                temperature *= self._cooling
+                if temperature <= self._min_temperature or self._stop_requested(): break
+            if not generated: break
+        dlog(f"Cooled down at cost {self._cost}")
+
+
+class TabuSearch[Sol, Action](HillClimbing[Sol, Action]):
+    """ applies the best of the first candidates generated actions at every step, even if it is worse,
+        except the tabu ones: those changing a part of the solution (given by _tabu_keys) that one of the
+        last tenure steps changed, unless they lead to a new best solution (aspiration), the restart
+        ends after patience steps without a new best solution """
+    _tenure: int
+    _candidates: int
+    _patience: int
+
+    def __init__(self, max_iter: int, improvement: Improvement = 'first', time_limit: float | None = None,
+                 tenure: int = 10, candidates: int = 500, patience: int = 200):
+        super().__init__(max_iter, improvement, time_limit)
+        self._tenure = tenure
+        self._candidates = candidates
+        self._patience = patience
+
+    def _tabu_keys(self, action: Action) -> Iterable[Hashable]:
+        """ the parts of the solution the action changes, by default the action itself """
+        return (action,)
+
+    @override
+    def _climb(self) -> None:
+        # the starting solution may already be the best one (a warm start)
+        self._record_best()
+        if self._cost == 0: return
+        # the step until which each key is tabu
+        tabu: dict[Hashable, int] = {}
+        step, stalled = 0, 0
+        while stalled < self._patience and not self._stop_requested():
+            best, best_delta = None, inf
+            candidates = list(islice(self._generate_actions(), self._candidates))
+            for action, delta in zip(candidates, self._evaluate_actions(candidates)):
+                if delta >= best_delta: continue
+                if self._cost + delta >= self._best_cost and \
+                        any(tabu.get(key, -1) >= step for key in self._tabu_keys(action)): continue
+                best, best_delta = action, delta
+            if best is None: break
+            for key in self._tabu_keys(best): tabu[key] = step + self._tenure
+            self._apply_action(best)
+            self._cost += best_delta
+            step += 1
+            if self._cost < self._best_cost:
+                self._record_best()
+                stalled = 0
+                if self._cost == 0: return
+            else: stalled += 1
+        dlog(f"Tabu search stalled at cost {self._cost}")
+
+
+# parallel restarts: every worker process builds its own instance once (with its own state)
+_worker_hc: HillClimbing | None = None
+
+def _init_worker(build: Callable[[], HillClimbing], shared_stop):
+    global _worker_hc
+    _worker_hc = build()
+    _worker_hc.shared_stop = shared_stop
+
+def _run_restarts(seed: int | None, restarts: int):
+    """ runs restarts of the worker instance from its own seed, returns (best solution, best cost) """
+    hc = cast(HillClimbing, _worker_hc)
+    random.seed(seed)
+    hc._max_iter = restarts
+    solution = hc.solve()
+    return solution, hc._best_cost
+
+def solve_parallel[Sol](build: Callable[[], HillClimbing[Sol, Any]], max_iter: int,
+                        workers: int | None = None, seed: int | None = None) -> tuple[Sol | None, float]:
+    """ runs max_iter restarts split between a pool of worker processes, each with its own seed
+        (derived from seed if given), the first solution of cost 0 stops all of them, build must be
+        picklable (a module level function or a partial of one), returns (best solution, best cost) """
+    workers = workers or cpu_count() or 1
+    shared_stop = Value('b', 0)
+    best_solution, best_cost = None, inf
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(build, shared_stop)) as executor:
+        # the restarts are split evenly, the workers that finish early are not given more
+        running = {executor.submit(_run_restarts, None if seed is None else seed + i,
+                                   max_iter // workers + (i < max_iter % workers))
+                   for i in range(min(workers, max_iter))}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                solution, cost = future.result()
+                dlog(f"[parallel] worker finished with cost {cost}")
+                if cost < best_cost: best_solution, best_cost = solution, cost
+    return best_solution, best_cost
\ No newline at end of file
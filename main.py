@@ -1,9 +1,17 @@
+from argparse import ArgumentParser
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 from math import inf
-from typing import Literal, cast
-from sys import argv, exit
+from os.path import abspath, dirname, isfile, join
+from random import Random, seed as seed_random
+from sys import exit, stderr
+from time import perf_counter
+from typing import Callable, Iterable, Literal, cast
 from commons import Commons
-from timetable_hc import TimetableHC
-from csp import PCSP, Constraint
+from timetable_hc import ENGINES, TimetableHC
+from csp import PCSP, Constraint, solve_parallel
+import hc
 from efficient_lists import ViewList
 from utils import pretty_print_timetable
 from yaml import safe_load as yaml_load
@@ -23,6 +31,13 @@ TOTAL_SLOTS: int
 TOTAL_CAPACITY: int
 NEEDED_CAPACITY: int
 
+# the inputs and outputs next to this file, whatever the working directory
+ROOT = dirname(abspath(__file__))
+def input_path(input_file: str) -> str:
+    return join(ROOT, 'inputs', f'{input_file}.yaml')
+def output_path(input_file: str) -> str:
+    return join(ROOT, 'outputs', f'{input_file}.txt')
+
 def read_data(file: str):
     global SLOTS
     global DAYS
@@ -66,6 +81,21 @@ def read_data(file: str):
     TOTAL_CAPACITY = len(DAYS) * len(SLOTS) * sum(CAP_ROOMS.values())
     NEEDED_CAPACITY = sum(CAP_COURSES.values())
 
+type Component = tuple[list[str], list[str], list[str]] # rooms, teachers, courses
+def restrict_data(component: Component):
+    """ keeps only the data of one component of Commons.components() """
+    global ROOMS, TEACHERS, COURSES, REP_ROOMS, REP_COURSES, CAP_ROOMS, CAP_COURSES
+    global PREFERENCES, TOTAL_CAPACITY, NEEDED_CAPACITY
+    rooms, teachers, courses = component
+    ROOMS, TEACHERS, COURSES = rooms, teachers, courses
+    REP_ROOMS = {room: REP_ROOMS[room] for room in rooms}
+    REP_COURSES = {course: REP_COURSES[course] for course in courses}
+    CAP_ROOMS = {room: CAP_ROOMS[room] for room in rooms}
+    CAP_COURSES = {course: CAP_COURSES[course] for course in courses}
+    PREFERENCES = {teacher: PREFERENCES[teacher] for teacher in teachers}
+    TOTAL_CAPACITY = TOTAL_SLOTS * sum(CAP_ROOMS.values())
+    NEEDED_CAPACITY = sum(CAP_COURSES.values())
+
 type VarType = tuple[str, int, str] # day, slot, room
 type Domain = tuple[str, str] | None # teacher, course
 V_DAY = 0; V_SLOT = 1; V_ROOM = 2
@@ -74,81 +104,139 @@ def sort(a: list, f):
     a.sort(key=f)
     return a
 
-def csp():
+def build_csp(input_file: str, symmetry: bool = False, component: Component | None = None):
+    """ reads the input file and returns the timetable problem as (pcsp, variables, domains,
+        constraints), a module level function so the worker processes can build it too,
+        with symmetry the interchangeable rooms are ordered by constraints,
+        with a component only its rooms, teachers and courses are scheduled """
+    read_data(input_path(input_file))
+    if component: restrict_data(component)
     pcsp = PCSP[VarType, Domain]()
     variables = [(day, slot, room) for day in DAYS 
                 for slot in SLOTS for room in ROOMS]
 
-    # order teachers ascending by preference for a slot
-    def teacher_order(var: VarType, a: tuple[str, str]):
-        teacher, _ = a
-        day, slot, _ = var
-        pref = PREFERENCES[teacher]
-        slots_count = sum(len(SLOTS) if isinstance(p, str) else len(p) for p in pref)
-        slots_count = TOTAL_SLOTS - slots_count
-        return 2 * TOTAL_SLOTS * (day in pref) + TOTAL_SLOTS * (range(slot, slot + 2, 2) in pref) + slots_count
-
-    domains = {
-        var: ViewList(sort([
-            (teacher, course) for course in REP_ROOMS[var[V_ROOM]]
+    # preference cost of every teacher in every (day, slot): the number of their
+    # preferences it breaks, one array indexed by teacher for each (day, slot)
+    teacher_index = {teacher: i for i, teacher in enumerate(TEACHERS)}
+    pref_costs = {
+        (day, slot): array('B', [
+            sum(1 for pref in PREFERENCES[teacher] if (slot in pref if isinstance(pref, range) else pref == day))
+            for teacher in TEACHERS
+        ]) for day in DAYS for slot in SLOTS
+    }
+    def unary_cost(var: VarType, val: Domain):
+        return pref_costs[var[V_DAY], var[V_SLOT]][teacher_index[val[A_TEACHER]]] if val else 0
+
+    # teachers with fewer allowed slots first, the solver then tries the cheapest values first
+    free_slots = {
+        teacher: TOTAL_SLOTS - sum(len(SLOTS) if isinstance(p, str) else len(p) for p in PREFERENCES[teacher])
+        for teacher in TEACHERS
+    }
+    # the domains only depend on the room, so the variables of a room share its domain
+    # (the solver sorts it by the preference costs of each slot, sharing the equal orders)
+    room_domains = {
+        room: ViewList(sort([
+            (teacher, course) for course in REP_ROOMS[room]
                               for teacher in REP_COURSES[course]
-        ], lambda a: teacher_order(var, a)) + [None])
-        for var in variables
+        ], lambda a: free_slots[a[A_TEACHER]]) + [None])
+        for room in ROOMS
     }
+    domains = {var: room_domains[var[V_ROOM]] for var in variables}
     # print(domains)
 
+    # the preferences are in the unary costs, the hard constraints in the dependencies below
     constraints: list[Constraint[VarType, Domain]] = []
-    for teacher, pref_set in PREFERENCES.items():
-        for pref in pref_set:
-            pref_range = isinstance(pref, range)
-            check = lambda teacher_: lambda val: not val or val[A_TEACHER] != teacher_
-            constraints += [
-                ([(day, slot, room)], check(teacher), 1)
-                for day in (DAYS if pref_range else [pref])
-                for slot in (SLOTS if not pref_range else cast(range, pref))
-                for room in ROOMS
-            ]
+    if symmetry: constraints += symmetry_constraints(free_slots)
 
     # variables that are dependent on the value of variables above
     # (day, slot, teacher) -> (room, course): all None by default
     # teacher -> number of slots the teacher teaches: 0
     # course -> occupied room capacity: 0
     # (used room capacity, used effective capacity): (0, 0)
+    # ('R', course) -> capacity of the unassigned variables whose room accepts the course
+    # ('T', course) -> slots left to the teachers of the course under their 7 slot cap
     USED_CAP_VAR = 'U'
     U_ROOM_CAP = 0
     U_EFFECTIVE_CAP = 1
+    course_rooms = {course: [room for room in ROOMS if course in REP_ROOMS[room]] for course in COURSES}
+    teacher_courses = {teacher: [course for course in COURSES if teacher in REP_COURSES[course]]
+                       for teacher in TEACHERS}
+    max_room_cap = {course: max((CAP_ROOMS[room] for room in course_rooms[course]), default=0)
+                    for course in COURSES}
     dep_vars = {
         teacher: 0 for teacher in TEACHERS }|{
         course: 0 for course in COURSES }|{
-        USED_CAP_VAR: (0, 0)
+        USED_CAP_VAR: (0, 0) }|{
+        ('R', course): len(DAYS) * len(SLOTS) * sum(CAP_ROOMS[room] for room in course_rooms[course])
+        for course in COURSES }|{
+        ('T', course): 7 * len(REP_COURSES[course]) for course in COURSES
     }
     pcsp.dependent_vars = dep_vars
 
     # assignment of a variable to a value can trigger changes in dependent variables
+    # the update functions receive the assignment that triggered them, so they are
+    # created only once instead of being closures over every (var, val)
+    def teacher_slot_update(old_val, var: VarType, val: Domain):
+        return (var[V_ROOM], val[A_COURSE]), not old_val
+    def teacher_hours_update(old_val, var: VarType, val: Domain):
+        return (old_val or 0) + 1, (old_val or 0) < 7
+    def course_cap_update(old_val, var: VarType, val: Domain):
+        return old_val + CAP_ROOMS[var[V_ROOM]], old_val < CAP_COURSES[val[A_COURSE]]
+    def used_cap_update(old_val, var: VarType, val: Domain):
+        room = var[V_ROOM]
+        course = val[A_COURSE] if val else None
+        # dep_vars[course] still holds the allocation before this assignment
+        need_cap = CAP_COURSES[course] - cast(int, dep_vars[course]) if course else 0
+        room_cap = old_val[U_ROOM_CAP] + CAP_ROOMS[room]
+        eff_cap = old_val[U_EFFECTIVE_CAP] + min(CAP_ROOMS[room], need_cap)
+        return (room_cap, eff_cap), TOTAL_CAPACITY - room_cap >= NEEDED_CAPACITY - eff_cap
+
+    # per course versions of the check above, created once for every course
+    def need_left(course: str, var: VarType, val: Domain):
+        # dep_vars[course] still holds the allocation before this assignment
+        allocated = cast(int, dep_vars[course]) + (CAP_ROOMS[var[V_ROOM]] if val and val[A_COURSE] == course else 0)
+        return CAP_COURSES[course] - allocated
+    def course_rooms_update(course: str):
+        # the rooms left that accept the course can still cover what it needs
+        def update(old_val, var: VarType, val: Domain):
+            new_val = old_val - CAP_ROOMS[var[V_ROOM]]
+            return new_val, need_left(course, var, val) <= new_val
+        return update
+    def course_teachers_update(course: str):
+        # the slots left to its teachers, each in its largest room, can still cover what it needs
+        def update(old_val, var: VarType, val: Domain):
+            return old_val - 1, need_left(course, var, val) <= max_room_cap[course] * (old_val - 1)
+        return update
+    course_rooms_updates = {course: course_rooms_update(course) for course in COURSES}
+    course_teachers_updates = {course: course_teachers_update(course) for course in COURSES}
+
+    restrictions_cache: dict[tuple[VarType, Domain], list] = {}
     def dependencies(var: VarType, val: Domain):
         """ returns a list of tuples (affected_dependent_var, update_function, update_cost)
-            update_function is old_val -> (new_val, success) 
+            update_function is (old_val, var, val) -> (new_val, success) 
             a failed update will increase the cost of the current assignment """
+        if (var, val) in restrictions_cache: return restrictions_cache[(var, val)]
         day, slot, room = var
         teacher, course = val or (None, None)
-        need_cap = CAP_COURSES[course] - cast(int, dep_vars[course]) if course else 0
-        eff_used_cap = min(CAP_ROOMS[room], need_cap)
         restrictions = [
+            # the capacity of a course is occupied by the number of slots it is taught
+            # (before the course update below, it reads the old allocation of the course)
+            (USED_CAP_VAR, used_cap_update, inf)
+        ] + [
+            # the room is used in this slot, whatever it is used for
+            (('R', other), course_rooms_updates[other], inf) for other in REP_ROOMS[room]
+        ] + ([
+            # the teacher used one of their slots, whatever course they teach
+            (('T', other), course_teachers_updates[other], inf) for other in teacher_courses[teacher]
+        ] if course else []) + ([
             # a teacher can only teach one course at a time in one room
-            ((day, slot, teacher), lambda old_val: ((room, course), not old_val), inf),
+            ((day, slot, teacher), teacher_slot_update, inf),
             # a teacher can not teach more than 7 slots a week
-            (teacher, lambda old_val: ((old_val or 0) + 1, (old_val or 0) < 7), inf),
+            (teacher, teacher_hours_update, inf),
             # the capacity of a course is not exceedingly allocated - speed up the search
-            (course, lambda old_val: (old_val + CAP_ROOMS[room], 
-                old_val < CAP_COURSES[course]), inf)
-        ] if course else []
-        restrictions.append(
-            # the capacity of a course is occupied by the number of slots it is taught
-            (USED_CAP_VAR, lambda old_val: ((
-                room_cap := old_val[U_ROOM_CAP] + CAP_ROOMS[room],
-                eff_cap  := old_val[U_EFFECTIVE_CAP] + eff_used_cap 
-            ), TOTAL_CAPACITY - room_cap >= NEEDED_CAPACITY - eff_cap), inf)
-        )
+            (course, course_cap_update, inf)
+        ] if course else [])
+        restrictions_cache[(var, val)] = restrictions
         return restrictions
 
     # total capacity over all rooms and all slots (T)
@@ -157,34 +245,288 @@ def csp():
     # total effective used capacity for all courses (Z)
     # constraint: T - C >= Y - Z
 
+    # the values made impossible by an assignment, mirroring the restrictions above
+    not_teacher = lambda teacher: lambda val: not val or val[A_TEACHER] != teacher
+    not_course = lambda course: lambda val: not val or val[A_COURSE] != course
+    def prunings(var: VarType, val: Domain):
+        if not val: return []
+        day, slot, room = var
+        teacher, course = val
+        # the teacher is busy in all the other rooms during this slot
+        result = [([(day, slot, other) for other in ROOMS if other != room], not_teacher(teacher))]
+        # the teacher reached the maximum number of slots
+        if dep_vars[teacher] >= 7: result.append((variables, not_teacher(teacher), teacher))
+        # the course is fully allocated
+        if dep_vars[course] >= CAP_COURSES[course]: result.append((variables, not_course(course), course))
+        return result
+
     pcsp.dependencies = dependencies
-    return pcsp.solve(ViewList(variables), domains, constraints, acceptable_cost=0)
+    pcsp.prunings = prunings
+    # no var_lower_bound: every domain keeps the free None value, so the cheapest cost an
+    # unassigned variable can add is 0 and the default bound is already the tightest one
+    pcsp.unary_cost = unary_cost
+    return pcsp, ViewList(variables), domains, constraints
 
-def hc():
-    pass
+def symmetry_constraints(free_slots: dict[str, int]):
+    """ lexicographic ordering constraints between interchangeable rooms: rooms with the same
+        capacity and courses can swap their values in any (day, slot), only the timetables where
+        the values of such rooms are ordered are explored, one of them exists in every class
+        (the course capacities see the same allocations in the same order after such a swap,
+        unlike after swapping whole (day, slot)s, which are not ordered) """
+    # a total order of the values, the empty room last as in the domains
+    rank: dict[Domain, int] = {None: len(TEACHERS) * len(COURSES)}
+    for teacher, course in sorted(((teacher, course) for course in COURSES for teacher in REP_COURSES[course]),
+                                  key=lambda a: (free_slots[a[A_TEACHER]], a)):
+        rank[(teacher, course)] = len(rank) - 1
+    ordered = lambda a, b: rank[a] <= rank[b]
 
-def main(algo: Literal['csp'] | Literal['hc'], input_file: str):
-    if algo == 'csp': 
-        read_data(f'inputs/{input_file}.yaml')
-        solution, cost, iterations = csp()
+    classes: dict[tuple, list] = {}
+    for room in ROOMS:
+        classes.setdefault((CAP_ROOMS[room], frozenset(REP_ROOMS[room])), []).append(room)
+    equivalent_rooms = [rooms for rooms in classes.values() if len(rooms) > 1]
+
+    constraints: list[Constraint[VarType, Domain]] = []
+    for day in DAYS:
+        for slot in SLOTS:
+            for rooms in equivalent_rooms:
+                constraints += [([(day, slot, a), (day, slot, b)], ordered, inf) for a, b in zip(rooms, rooms[1:])]
+    return constraints
+
+def trim_allocations(variables: Iterable[VarType], timetable: dict) -> dict:
+    """ the timetable of the variables, without the slots of the courses already allocated
+        to their capacity by the variables before them (the hill climbing allows them but the
+        csp does not, and they only add preference costs) """
+    allocated = dict.fromkeys(COURSES, 0)
+    trimmed = {}
+    for var in variables:
+        val = timetable.get(var)
+        if val and allocated[val[A_COURSE]] >= CAP_COURSES[val[A_COURSE]]: val = None
+        if val: allocated[val[A_COURSE]] += CAP_ROOMS[var[V_ROOM]]
+        trimmed[var] = val
+    return trimmed
+
+def csp(input_file: str, workers: int = 1, split: int = 1, symmetry: bool = False,
+        component: Component | None = None, initial: dict | None = None, **options):
+    """ options are passed to PCSP.solve (propagation, order, max_cost, restarts, ...),
+        with more than one worker the search is split on the values of the first split variables,
+        an initial timetable is the incumbent: only better ones are searched, trying its values first """
+    pcsp, variables, domains, constraints = build_csp(input_file, symmetry, component)
+    if initial is not None:
+        initial = trim_allocations(variables, initial)
+        options['incumbent'] = initial, pcsp.evaluate(variables, constraints, initial)
+    if workers > 1:
+        return solve_parallel(partial(build_csp, input_file, symmetry, component), 0, split, workers, **options)
+    return pcsp.solve(variables, domains, constraints, acceptable_cost=0, **options)
+
+# the restarts of each engine, an annealing or a tabu search runs several times longer than a climb
+HC_RESTARTS = {'hc': 1000, 'sa': 100, 'tabu': 100}
+def new_hc(initial: dict | None = None, engine: str = 'hc', **hc_options) -> TimetableHC:
+    """ the local search of the timetable in Commons with the engine (hc, sa or tabu) """
+    return ENGINES[engine](max_iter=HC_RESTARTS[engine], initial=initial, **hc_options)
+
+def build_hc(input_file: str, initial: dict | None = None, **hc_options) -> TimetableHC:
+    """ reads the input file and returns the local search of the timetable,
+        a module level function so the worker processes can build it too """
+    Commons.read_data(input_path(input_file))
+    return new_hc(initial, **hc_options)
+
+LNS_REGIONS = ['day', 'teacher', 'rooms']
+LNS_REGION_NODES = 1000
+LNS_PATIENCE = 200
+
+def lns(input_file: str, component: Component | None = None, time_limit: float | None = None,
+        node_limit: int | None = None, seed: int | None = None, initial: dict | None = None,
+        on_solution: Callable[[dict, float, int], None] | None = None, **options):
+    """ large neighbourhood search: starts from one hill climbing descent (or the initial
+        timetable), then repeatedly frees a
+        region of the timetable (a day, the slots of a teacher with the empty ones, or two rooms) and
+        re-solves it with branch and bound while the rest stays fixed, keeping the improvements,
+        until the cost is 0, time_limit seconds passed or LNS_PATIENCE regions did not improve it,
+        every region gets node_limit nodes (LNS_REGION_NODES by default), options are passed to
+        PCSP.solve, returns (timetable, cost, iterations) with the cost of the csp """
+    deadline = inf if time_limit is None else perf_counter() + time_limit
+    node_limit = node_limit or LNS_REGION_NODES
+    random = Random(seed)
+    pcsp, variables, domains, constraints = build_csp(input_file, component=component)
+    if initial is None:
+        Commons.read_data(input_path(input_file))
+        if component: Commons.restrict(*component)
+        initial = TimetableHC(max_iter=1).solve()
+
+    solution = trim_allocations(variables, initial)
+    iterations = 0
+    def resolve(region: set[VarType], max_cost: float):
+        nonlocal iterations
+        # the fixed variables come first with their current value as their only one
+        order = [var for var in variables if var not in region] + [var for var in variables if var in region]
+        fixed = domains | {var: [solution[var]] for var in variables if var not in region}
+        time_left = None if deadline == inf else max(0, deadline - perf_counter())
+        new_solution, new_cost, _ = pcsp.solve(order, fixed, constraints, acceptable_cost=0, max_cost=max_cost,
+                                               node_limit=node_limit, time_limit=time_left, **options)
+        iterations += pcsp._iterations
+        return new_solution, new_cost
+
+    cost = pcsp.evaluate(variables, constraints, solution)
+    iterations += pcsp._iterations
+    if on_solution: on_solution(solution, cost, iterations)
+    stalled = 0
+    while cost > 0 and stalled < LNS_PATIENCE and perf_counter() < deadline:
+        kind = random.choice(LNS_REGIONS)
+        teachers = [val[A_TEACHER] for val in solution.values() if val]
+        if kind == 'teacher' and teachers:
+            teacher = random.choice(teachers)
+            region = {var for var, val in solution.items() if not val or val[A_TEACHER] == teacher}
+        elif kind == 'rooms':
+            rooms = random.sample(list(ROOMS), min(2, len(ROOMS)))
+            region = {var for var in variables if var[V_ROOM] in rooms}
+        else:
+            day = random.choice(DAYS)
+            region = {var for var in variables if var[V_DAY] == day}
+        # the costs are numbers of broken preferences, only strictly better regions are explored
+        new_solution, new_cost = resolve(region, cost - 1)
+        if new_cost < cost:
+            solution, cost, stalled = new_solution, new_cost, 0
+            if on_solution: on_solution(solution, cost, iterations)
+        else: stalled += 1
+    return solution, cost, iterations
+
+def solve_component(algo: Literal['csp', 'hc', 'lns'], input_file: str, component: Component, options: dict):
+    """ schedules one component in a worker process, returns (timetable, cost, iterations) """
+    if algo == 'csp':
+        return csp(input_file, component=component, **options)
+    if algo == 'lns':
+        return lns(input_file, component=component, **options)
+    Commons.read_data(input_path(input_file))
+    Commons.restrict(*component)
+    # every component from the seed, whichever worker solves it after whichever other one
+    seed_random(options.get('seed'))
+    climbing = new_hc(options.get('initial'), **options['hc_options'])
+    solution = climbing.solve()
+    return solution, climbing._best_cost, 0
+
+def decompose(algo: Literal['csp', 'hc', 'lns'], input_file: str, workers: int = 1,
+              progress: bool = False, **options):
+    """ schedules the components of the compatibility graph (Commons.components(), they share
+        no rooms and no teachers) in a pool of workers processes and merges their timetables,
+        the rooms of no component stay empty, the costs and iterations add up """
+    components = Commons.components()
+    solution, cost, iterations = {}, 0, 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # the largest components are submitted first, the small ones fill the gaps
+        futures = {executor.submit(solve_component, algo, input_file, component, options): component
+                   for component in components}
+        for i, future in enumerate(as_completed(futures)):
+            partial_solution, partial_cost, partial_iterations = future.result()
+            solution |= partial_solution
+            cost += partial_cost
+            iterations += partial_iterations
+            if progress:
+                print(f"component {i + 1}/{len(components)} ({len(futures[future][0])} rooms) "
+                      f"solved with cost {partial_cost}", file=stderr)
+    return solution, cost, iterations
+
+def main(algo: Literal['csp', 'hc', 'lns'], input_file: str, progress: bool = False,
+         components: bool = False, warm_start: bool = False, **options):
+    # the necessary conditions are checked in milliseconds before searching for nothing
+    Commons.read_data(input_path(input_file))
+    problems = Commons.infeasibilities()
+    if problems:
+        print("The input is infeasible:", *problems, sep='\n- ', file=stderr)
+        exit(1)
+    # the previous timetable of the input, which may have changed since it was printed
+    initial = None
+    if warm_start and not isfile(output_path(input_file)):
+        print(f"No previous timetable in outputs/{input_file}.txt, starting from scratch", file=stderr)
+    elif warm_start: initial = Commons.read_timetable(output_path(input_file))
+    if initial is not None: options['initial'] = initial
+    # the options of the hill climbing, the others are passed to the csp
+    hc_options = {key: options.pop(key) for key in ['engine', 'neighbourhood', 'improvement', 'sample_size']}
+    if algo == 'hc': hc_options['time_limit'] = options['time_limit']
+    if algo == 'lns':
+        # the regions are solved on one process, bounded by the current cost, and the symmetry
+        # constraints would reject most of the fixed timetables
+        for key in ['split', 'symmetry', 'max_cost']: options.pop(key)
+        if not components: options.pop('workers')
+    if algo != 'hc':
+        start = perf_counter()
+        if components:
+            solution, cost, iterations = decompose(algo, input_file, progress=progress, **options)
+            # the components were read by the workers, the whole input is printed
+            read_data(input_path(input_file))
+        else:
+            if progress:
+                options['on_solution'] = lambda _, cost, iterations: \
+                    print(f"cost {cost} after {iterations} iterations ({perf_counter() - start:.3f}s)", file=stderr)
+            solution, cost, iterations = (csp if algo == 'csp' else lns)(input_file, **options)
+        elapsed = perf_counter() - start
         print(pretty_print_timetable({
             day: {
                 (slot, slot + 2): {
                     room: solution.get((day, slot, room)) for room in ROOMS
                 } for slot in SLOTS
             } for day in DAYS
-        }, f"inputs/{input_file}.yaml"))
-        print(f"Final cost: {cost}, iterations: {iterations}")
+        }, input_path(input_file)))
+        print(f"Final cost: {cost}, iterations: {iterations}, "
+              f"time: {elapsed:.3f}s ({iterations / elapsed:.0f} nodes/s)")
+    elif components:
+        solution, _, _ = decompose(algo, input_file, progress=progress, hc_options=hc_options, **options)
+        Commons.print_timetable(solution)
+    elif options['workers'] > 1:
+        # the restarts of the hill climbing run in parallel, each worker from its own seed
+        build = partial(build_hc, input_file, initial, **hc_options)
+        solution, _ = hc.solve_parallel(build, HC_RESTARTS[hc_options['engine']], options['workers'], options['seed'])
+        Commons.print_timetable(solution)
     else:
-        Commons.read_data(f'inputs/{input_file}.yaml')
-        hc = TimetableHC()
-        solution = hc.solve()
+        seed_random(options['seed'])
+        solution = new_hc(initial, **hc_options).solve()
         Commons.print_timetable(solution)
 
 if __name__ == '__main__':
-    if len(argv) != 3:
-        print('Usage: python3 main.py [csp|hc] input_file')
-        exit(1)
-    assert argv[1] in ['csp', 'hc'], 'Invalid argument'
-    argv[1] = cast(Literal['csp'] | Literal['hc'], argv[1])
-    main(argv[1], argv[2])
\ No newline at end of file
+    parser = ArgumentParser(description='Timetable generator')
+    parser.add_argument('algo', choices=['csp', 'hc', 'lns'])
+    parser.add_argument('input_file', help='name of the input file in inputs/, without extension')
+    parser.add_argument('--propagation', choices=['none', 'fc', 'ac3'], default='none',
+                        help='constraint propagation used by csp')
+    parser.add_argument('--order', choices=['static', 'mrv', 'degree', 'domwdeg'], default='static',
+                        help='variable ordering heuristic used by csp')
+    parser.add_argument('--max-cost', type=float, default=0,
+                        help='cost of the partial timetables explored by csp (inf for branch and bound)')
+    parser.add_argument('--backjumping', action='store_true',
+                        help='conflict directed backjumping in csp')
+    parser.add_argument('--nogoods', type=int, default=0, dest='nogood_limit',
+                        help='maximum number of nogoods learned by csp when backjumping')
+    parser.add_argument('--restarts', choices=['none', 'luby', 'geometric'], default='none',
+                        help='restart schedule of csp')
+    parser.add_argument('--restart-base', type=int, default=100,
+                        help='number of nodes of the first csp run when restarting')
+    parser.add_argument('--randomization', type=float, default=0.1,
+                        help='probability of shuffling each value when csp restarts')
+    parser.add_argument('--seed', type=int, default=None, help='random seed')
+    parser.add_argument('--time-limit', type=float, default=None,
+                        help='seconds after which csp, lns or hc stop with the best timetable found so far')
+    parser.add_argument('--node-limit', type=int, default=None,
+                        help='number of nodes after which csp stops with the best timetable found so far '
+                             '(for lns, of every region)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes csp and hc run on (the components with --decompose)')
+    parser.add_argument('--split', type=int, default=1,
+                        help='number of variables whose values split the csp search between the workers')
+    parser.add_argument('--symmetry', action='store_true',
+                        help='break the symmetries between interchangeable rooms in csp')
+    parser.add_argument('--decompose', action='store_true', dest='components',
+                        help='schedule the groups of courses that share no rooms and no teachers separately')
+    parser.add_argument('--engine', choices=['hc', 'sa', 'tabu'], default='hc',
+                        help='local search of hc: hill climbing, simulated annealing or tabu search')
+    parser.add_argument('--neighbourhood', choices=['full', 'sampled', 'focused'], default='full',
+                        help='actions hc considers at every step: all of them, a random sample '
+                             'or a random sample of the ones touching a violation')
+    parser.add_argument('--improvement', choices=['first', 'best'], default='first',
+                        help='hc takes the first improving action or the best one it considers')
+    parser.add_argument('--sample-size', type=int, default=None,
+                        help='number of actions of the sampled neighbourhood of hc (20 for every slot by default)')
+    parser.add_argument('--warm-start', action='store_true',
+                        help='start from the timetable in outputs/ and only repair what the input changes broke')
+    parser.add_argument('--progress', action='store_true',
+                        help='print the cost of every improved timetable found by csp to stderr')
+    args = vars(parser.parse_args())
+    main(args.pop('algo'), args.pop('input_file'), **args)
\ No newline at end of file
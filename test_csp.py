@@ -0,0 +1,103 @@
+""" checks of the csp solver against brute force on small random problems: python -m unittest test_csp """
+import unittest
+from itertools import product
+from math import inf
+from random import Random
+from csp import PCSP, solve_parallel
+
+def random_problem(rng: Random):
+    """ a few variables with small domains and random unary, binary and ternary constraints,
+        some of them hard (of infinite cost) """
+    variables = list(range(rng.randint(4, 6)))
+    domain = list(range(rng.randint(3, 4)))
+    constraints = []
+    for _ in range(rng.randint(4, 10)):
+        scope = rng.sample(variables, rng.choice([1, 2, 2, 2, 3]))
+        # the allowed tuples of the scope
+        allowed = {vals for vals in product(domain, repeat=len(scope)) if rng.random() < 0.5}
+        cost = inf if rng.random() < 0.5 else rng.randint(1, 3)
+        constraints.append((scope, lambda *vals, allowed=allowed: vals in allowed, cost))
+    return variables, {var: domain for var in variables}, constraints
+
+def new_pcsp() -> PCSP:
+    pcsp = PCSP[int, int]()
+    pcsp.dependencies = lambda var, val: []
+    return pcsp
+
+def optimum(variables, domains, constraints) -> float:
+    return min(sum(cost for scope, relation, cost in constraints
+                   if not relation(*(solution[var] for var in scope)))
+               for solution in (dict(zip(variables, vals))
+                                for vals in product(*(domains[var] for var in variables))))
+
+def build_problem():
+    """ the same random problem in every worker process of solve_parallel """
+    pcsp = new_pcsp()
+    variables, domains, constraints = random_problem(Random(3))
+    return pcsp, variables, domains, constraints
+
+def build_unsatisfiable():
+    constraints = [([0, 1], lambda a, b: False, inf)]
+    return new_pcsp(), [0, 1], {0: [0, 1], 1: [0, 1]}, constraints
+
+class BruteForce(unittest.TestCase):
+    def test_search_options(self):
+        rng = Random(1)
+        problems = [random_problem(rng) for _ in range(200)]
+        optima = [optimum(*problem) for problem in problems]
+        for propagation, backjumping, nogood_limit, restarts, max_cost in product(
+                ['none', 'fc', 'ac3'], [False, True], [0, 10], ['none', 'luby'], [0, inf]):
+            if nogood_limit and not backjumping: continue
+            options = dict(propagation=propagation, backjumping=backjumping, nogood_limit=nogood_limit,
+                           restarts=restarts, restart_base=4, seed=0, max_cost=max_cost)
+            with self.subTest(**options):
+                for i, ((variables, domains, constraints), best) in enumerate(zip(problems, optima)):
+                    _, cost, _ = new_pcsp().solve(variables, domains, constraints, acceptable_cost=0, **options)
+                    # with max_cost 0 only the solutions of cost 0 are searched
+                    self.assertEqual(cost, best if max_cost == inf or best == 0 else inf, f"problem {i}")
+
+    def test_var_lower_bound(self):
+        # a bound from the unary constraints given by the model, instead of the default one
+        rng = Random(2)
+        for i in range(100):
+            variables, domains, constraints = random_problem(rng)
+            unary = [(scope[0], relation, cost) for scope, relation, cost in constraints
+                     if len(set(scope)) == 1 and cost < inf]
+            pcsp = new_pcsp()
+            pcsp.var_lower_bound = lambda var, domain: min(
+                (sum(cost for other, relation, cost in unary if other == var and not relation(val))
+                 for val in domain), default=0)
+            _, cost, _ = pcsp.solve(variables, domains, constraints, acceptable_cost=0,
+                                    propagation='fc', max_cost=inf)
+            self.assertEqual(cost, optimum(variables, domains, constraints), f"problem {i}")
+
+    def test_parallel(self):
+        pcsp, variables, domains, constraints = build_problem()
+        _, cost, _ = solve_parallel(build_problem, 0, 2, 2, propagation='fc', max_cost=inf)
+        self.assertEqual(cost, optimum(variables, domains, constraints))
+
+    def test_parallel_split_nodes(self):
+        # the split tries every value of the first variable and leaves no unit, its nodes are all there is
+        _, cost, iterations = solve_parallel(build_unsatisfiable, 0, 2, 2, propagation='fc')
+        self.assertEqual(cost, inf)
+        self.assertEqual(iterations, 2)
+
+    def test_single_solution(self):
+        # forward checking removes the values of the last variable before its frame is built,
+        # its conflict set must include the variables that pruned them
+        variables = [0, 1, 2, 3]
+        domains = {var: [0, 1, 2, 3] for var in variables}
+        allowed = [([1, 2], {(1, 2), (2, 2), (3, 2), (3, 3)}),
+                   ([0, 1], {(0, 3), (2, 1), (3, 0), (3, 2)}),
+                   ([1, 3], {(0, 3), (1, 1), (1, 2), (1, 3), (2, 1), (3, 0), (3, 1)}),
+                   ([1, 2], {(1, 0), (1, 1), (2, 2), (2, 3), (3, 0)})]
+        constraints = [(scope, lambda a, b, pairs=pairs: (a, b) in pairs, inf) for scope, pairs in allowed]
+        for backjumping in [False, True]:
+            with self.subTest(backjumping=backjumping):
+                solution, cost, _ = new_pcsp().solve(variables, domains, constraints, acceptable_cost=0,
+                                                     propagation='fc', backjumping=backjumping)
+                self.assertEqual(cost, 0)
+                self.assertEqual(solution, {0: 3, 1: 2, 2: 2, 3: 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+""" checks of the sparse set against a plain set: python -m unittest test_efficient_lists """
+import unittest
+from random import Random
+from efficient_lists import SparseSet
+
+class SparseSetChecks(unittest.TestCase):
+    def test_remove_and_restore(self):
+        rng = Random(1)
+        values = [f"v{i}" for i in range(12)]
+        sparse_set, members = SparseSet(len(values)), set(range(len(values)))
+        markers = []
+        for _ in range(1000):
+            # remove a few members and keep the marker, or go back to the last one
+            if markers and rng.random() < 0.4:
+                size, members = markers.pop()
+                sparse_set.restore(size)
+            else:
+                markers.append((sparse_set.size, set(members)))
+                for i in rng.sample(range(len(values)), rng.randint(1, 3)):
+                    sparse_set.remove(i)
+                    members.discard(i)
+            self.assertEqual(set(sparse_set), members)
+            self.assertEqual(sparse_set.select(values), [values[i] for i in sorted(members)])
+
+if __name__ == '__main__':
+    unittest.main()
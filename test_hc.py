@@ -0,0 +1,66 @@
+""" checks of the local search engines: python -m unittest test_hc """
+import os
+import random
+import subprocess
+import sys
+import unittest
+from os.path import dirname, join
+from time import perf_counter
+from commons import Commons
+from timetable_hc import TimetableHC, TimetableSA, TimetableTabu
+
+INPUTS = join(dirname(__file__), 'inputs')
+
+class EngineStart(unittest.TestCase):
+    ENGINES = {'sa': (TimetableSA, {'temperature': 1000}), 'tabu': (TimetableTabu, {'patience': 1})}
+
+    def setUp(self):
+        Commons.read_data(join(INPUTS, 'orar_mic_exact.yaml'))
+        random.seed(1)
+
+    def test_valid_warm_start(self):
+        # a timetable without violations is returned unchanged
+        climbing = TimetableSA(max_iter=20)
+        valid = climbing.solve()
+        self.assertEqual(climbing._best_cost, 0)
+        for name, (engine, _) in self.ENGINES.items():
+            with self.subTest(name):
+                climbing = engine(max_iter=1, initial=valid, neighbourhood='focused')
+                self.assertEqual(climbing.solve(), valid)
+                self.assertEqual(climbing._best_cost, 0)
+
+    def test_no_worse_than_start(self):
+        # from a local optimum of the hill climbing, a hot annealing or a short tabu search
+        # may only walk away from it, the best solution is still the starting one
+        climbing = TimetableHC(max_iter=1, neighbourhood='sampled')
+        optimum = climbing.solve()
+        for name, (engine, options) in self.ENGINES.items():
+            with self.subTest(name):
+                engine_climbing = engine(max_iter=1, initial=optimum, neighbourhood='sampled', **options)
+                self.assertIsNotNone(engine_climbing.solve())
+                self.assertLessEqual(engine_climbing._best_cost, climbing._best_cost)
+
+class TimeLimit(unittest.TestCase):
+    def test_engines_stop(self):
+        # the restarts never reach cost 0 on this input, only the time limit stops them
+        Commons.read_data(join(INPUTS, 'orar_constrans_incalcat.yaml'))
+        for engine in [TimetableHC, TimetableSA, TimetableTabu]:
+            with self.subTest(engine.__name__):
+                start = perf_counter()
+                self.assertIsNotNone(engine(max_iter=10 ** 6, time_limit=1).solve())
+                self.assertLess(perf_counter() - start, 3)
+
+class Seed(unittest.TestCase):
+    def run_main(self, hash_seed: str, *args: str) -> str:
+        env = os.environ | {'PYTHONHASHSEED': hash_seed}
+        return subprocess.run([sys.executable, join(dirname(__file__), 'main.py'), 'hc', 'dummy', *args],
+                              env=env, capture_output=True, text=True, check=True).stdout
+
+    def test_same_timetable(self):
+        # the same seed gives the same timetable, whatever the string hashes of the process
+        for args in [('--seed', '1'), ('--seed', '1', '--engine', 'sa', '--decompose', '--workers', '2')]:
+            with self.subTest(args):
+                self.assertEqual(self.run_main('1', *args), self.run_main('2', *args))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+""" checks of the timetable deltas: python -m unittest test_timetable_hc """
+import random
+import unittest
+from os.path import dirname, join
+from commons import Commons
+from timetable_hc import TimetableHC
+
+INPUTS = join(dirname(__file__), 'inputs')
+
+class Deltas(unittest.TestCase):
+    def setUp(self):
+        random.seed(1)
+
+    def climbed(self, input_file: str, neighbourhood: str) -> TimetableHC:
+        """ a hill climbing left at the local optimum of one restart """
+        Commons.read_data(join(INPUTS, f'{input_file}.yaml'))
+        climbing = TimetableHC(max_iter=1, neighbourhood=neighbourhood)
+        climbing.solve()
+        return climbing
+
+    def test_batch_equals_scalar(self):
+        for input_file, neighbourhood in [('orar_mic_exact', 'sampled'), ('orar_constrans_incalcat', 'focused')]:
+            with self.subTest(input_file):
+                climbing = self.climbed(input_file, neighbourhood)
+                actions = list(climbing._generate_actions())
+                self.assertTrue(any(action[0] == 'swap' for action in actions))
+                self.assertEqual(climbing._evaluate_actions(actions),
+                                 [climbing._evaluate_action(action) for action in actions])
+
+    def test_swap_equals_its_changes(self):
+        # a swap costs its first change plus the second one made after it
+        climbing = self.climbed('orar_mic_exact', 'sampled')
+        for action in climbing._generate_actions():
+            if action[0] != 'swap': continue
+            var1, var2 = action[1], action[2]
+            val1, val2 = climbing._solution[var1], climbing._solution[var2]
+            delta = climbing._evaluate_action(action)
+            change1 = climbing._evaluate_change_action(var1, val2)
+            climbing._apply_action(('change', var1, val2))
+            change2 = climbing._evaluate_change_action(var2, val1)
+            climbing._apply_action(('change', var1, val1))
+            self.assertEqual(delta, change1 + change2, action)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+""" regression checks of the warm start: python -m unittest test_warm_start """
+import unittest
+from contextlib import redirect_stdout
+from functools import partial
+from io import StringIO
+from os.path import join
+from tempfile import TemporaryDirectory
+from commons import Commons
+from csp import solve_parallel
+from main import build_csp, csp, input_path
+
+INPUT = 'orar_mic_exact'
+
+class ParallelIncumbent(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.solution, cls.cost, _ = csp(INPUT, propagation='fc')
+
+    def test_acceptable_incumbent(self):
+        # nothing is left to search, the incumbent is the result
+        solution, cost, _ = csp(INPUT, workers=2, initial=self.solution, propagation='fc')
+        self.assertEqual(cost, self.cost)
+        self.assertEqual(solution, self.solution)
+
+    def test_unbeaten_incumbent(self):
+        # no unit can go below cost 0, they all return nothing better
+        solution, cost, _ = solve_parallel(partial(build_csp, INPUT), -1, 1, 2, propagation='fc',
+                                           incumbent=(self.solution, self.cost))
+        self.assertEqual(cost, self.cost)
+        self.assertEqual(solution, self.solution)
+
+class ReadTimetable(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        solution, _, _ = csp(INPUT, propagation='fc')
+        cls.solution = {var: val for var, val in solution.items() if val}
+        Commons.read_data(input_path(INPUT))
+        with redirect_stdout(StringIO()) as printed: Commons.print_timetable(solution)
+        cls.printed = printed.getvalue()
+
+    def read(self, text: str) -> dict:
+        with TemporaryDirectory() as directory:
+            with open(join(directory, f'{INPUT}.txt'), 'w') as f: f.write(text)
+            timetable = Commons.read_timetable(join(directory, f'{INPUT}.txt'))
+        return {var: val for var, val in timetable.items() if val}
+
+    def test_round_trip(self):
+        self.assertEqual(self.read(self.printed), self.solution)
+
+    def test_unknown_cells(self):
+        # the cells of a course missing from the input are left empty, the others are kept
+        _, course = next(iter(self.solution.values()))
+        kept = {var: val for var, val in self.solution.items() if val[1] != course}
+        self.assertLess(len(kept), len(self.solution))
+        self.assertEqual(self.read(self.printed.replace(f" {course} : (", " Unknown : (")), kept)
+        # and the lines that are not cells are skipped
+        self.assertEqual(self.read("header\n" + self.printed + "|| broken |\n"), self.solution)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,82 +1,234 @@
+from array import array
 from itertools import chain, product, zip_longest
 from random import choice
 import random
-from typing import Generator, Iterator, Literal
-from commons import A_COURSE, A_TEACHER, Commons, Sol, Var, Val, Room, Teacher, Course, Slot, Day
-from hc import HillClimbing
+import numpy as np
+from typing import Hashable, Iterable, Iterator, Literal
+from commons import Commons, Sol, Var, Teacher, Course
+from hc import HillClimbing, Improvement, SimulatedAnnealing, TabuSearch
 
-type Action = tuple[Literal['change'], Var, Val] | tuple[Literal['swap'], Var, Var]
+# the timetable is encoded with integer ids: a period is day * len(SLOTS) + slot, a var (a room in
+# a period) is period * len(ROOMS) + room and a value is the index of its (teacher, course) in
+# _VALUES, EMPTY for none; the solution holds the value of every var, the teacher table the var of
+# every teacher in every period (at period * len(TEACHERS) + teacher), both decoded only at output
+type Encoded = array[int]
+EMPTY = -1
+
+type Action = tuple[Literal['change'], int, int] | tuple[Literal['swap'], int, int]
+# every change and swap in a random order, a bounded random sample of them,
+# or a sample of the ones touching a violation (min-conflicts)
+type Neighbourhood = Literal['full', 'sampled', 'focused']
+# actions sampled for every slot by default, so a step costs linear time instead of quadratic
+SAMPLE_FACTOR = 20
 
 DEBUG = False
-class TimetableHC(HillClimbing[Sol, Action]):
+
+class TimetableHC(HillClimbing[Encoded, Action]):
     _ROOM_ALLOC_WEIGHT: int
     _TEACHER_MAX_HOURS_WEIGHT: int
     _TEACHER_PREF_DAY_WEIGHT: int
     _TEACHER_PREF_SLOT_WEIGHT: int
 
-    _teacher_table: dict[tuple[Day, Slot, Teacher], tuple[Room, Course] | None] = {}
-    _teacher_hours: dict[Teacher, int]
-    _course_allocs: dict[Course, int]
+    # the decoding of the ids: the (day, slot, room) of every var and the (teacher, course) of every value
+    _VARS: list[Var]
+    _VALUES: list[tuple[Teacher, Course]]
+    _value_ids: dict[tuple[Teacher, Course], int]
+    _val_teacher: list[int]
+    _val_course: list[int]
+    _n_slots: int
+    _n_rooms: int
+    _n_teachers: int
+    _n_courses: int
+    # the input by id: capacities, whether a room accepts a course (at room * len(COURSES) + course)
+    # and the free days and slots of the teachers (at teacher * len(DAYS) + day and teacher * len(SLOTS) + slot)
+    _room_cap: list[int]
+    _course_cap: list[int]
+    _room_accepts: bytearray
+    _free_days: bytearray
+    _free_slots: bytearray
+    # the same tables as numpy arrays, for the batch evaluation
+    _np_val_teacher: np.ndarray
+    _np_val_course: np.ndarray
+    _np_room_cap: np.ndarray
+    _np_course_cap: np.ndarray
+    _np_free_days: np.ndarray
+    _np_free_slots: np.ndarray
+
+    _teacher_table: Encoded
+    _teacher_hours: list[int]
+    _course_allocs: list[int]
+    # warm start: the first solution, the restarts after it are random
+    _initial: Sol | None
 
-    def __init__(self):
+    _neighbourhood: Neighbourhood
+    _sample_size: int
+    # compatibility indexes of the sampled neighbourhood: the values of the rooms
+    # (with the empty one) and the rooms that accept each course
+    _room_values: list[list[int]]
+    _room_courses: list[list[int]]
+    _course_rooms: list[list[int]]
+    _course_values: list[list[int]]
+    # violation index of the focused neighbourhood, kept up to date by _apply_action: the courses
+    # below their capacity, the teachers above 7 slots and the vars whose teacher prefers another
+    # day or interval
+    _under_courses: set[int]
+    _over_teachers: set[int]
+    _unwanted_slots: set[int]
+
+    def __init__(self, max_iter: int = 1000, initial: Sol | None = None, neighbourhood: Neighbourhood = 'full',
+                 improvement: Improvement = 'first', sample_size: int | None = None, **engine_options):
         if not Commons.data_ready():
             raise Exception("Commons not initialized")
-        self._ALL_SLOTS = list(product(Commons.DAYS, Commons.SLOTS, Commons.ROOMS))
-        self._ALL_VALUES = lambda room: [(teacher, course) for course in Commons.REP_ROOMS[room]
-                                        for teacher in Commons.REP_COURSES[course]]
+        days, slots, rooms = list(Commons.DAYS), list(Commons.SLOTS), list(Commons.ROOMS)
+        teachers, courses = list(Commons.TEACHERS), list(Commons.COURSES)
+        teacher_ids = {teacher: i for i, teacher in enumerate(teachers)}
+        course_ids = {course: i for i, course in enumerate(courses)}
+        self._VARS = list(product(days, slots, rooms))
+        # the sets of Commons are read sorted, their order changes with the string hashes of every run
+        # and a random seed would not give the same search
+        rep_rooms = {room: sorted(Commons.REP_ROOMS[room]) for room in rooms}
+        rep_courses = {course: sorted(Commons.REP_COURSES[course]) for course in courses}
+        self._VALUES = [(teacher, course) for course in courses for teacher in rep_courses[course]]
+        self._value_ids = {val: i for i, val in enumerate(self._VALUES)}
+        self._val_teacher = [teacher_ids[teacher] for teacher, _ in self._VALUES]
+        self._val_course = [course_ids[course] for _, course in self._VALUES]
+        self._n_slots, self._n_rooms = len(slots), len(rooms)
+        self._n_teachers, self._n_courses = len(teachers), len(courses)
+        self._room_cap = [Commons.CAP_ROOMS[room] for room in rooms]
+        self._course_cap = [Commons.CAP_COURSES[course] for course in courses]
+        self._room_accepts = bytearray(course in Commons.REP_ROOMS[room] for room in rooms for course in courses)
+        self._free_days = bytearray(day in Commons.FREE_DAYS[teacher] for teacher in teachers for day in days)
+        self._free_slots = bytearray(slot in Commons.FREE_SLOTS[teacher] for teacher in teachers for slot in slots)
+        self._np_val_teacher, self._np_val_course = np.array(self._val_teacher), np.array(self._val_course)
+        self._np_room_cap, self._np_course_cap = np.array(self._room_cap), np.array(self._course_cap)
+        self._np_free_days = np.frombuffer(self._free_days, np.uint8).astype(int)
+        self._np_free_slots = np.frombuffer(self._free_slots, np.uint8).astype(int)
+
+        self._ALL_SLOTS = list(range(len(self._VARS)))
         self._TEACHER_PREF_SLOT_WEIGHT = 25 # 1
         self._TEACHER_PREF_DAY_WEIGHT = 50 # 2
         self._TEACHER_MAX_HOURS_WEIGHT = 75 # 3 * Commons.TOTAL_SLOTS + 1
         self._ROOM_ALLOC_WEIGHT = 100 # 4 * Commons.TOTAL_SLOTS
-        super().__init__(max_iter=1000)
+        self._initial = initial
+        self._neighbourhood = neighbourhood
+        self._sample_size = sample_size or SAMPLE_FACTOR * len(self._ALL_SLOTS)
+        self._room_courses = [[course_ids[course] for course in rep_rooms[room]] for room in rooms]
+        self._room_values = [[self._value_ids[(teacher, course)] for course in rep_rooms[room]
+                              for teacher in rep_courses[course]] + [EMPTY] for room in rooms]
+        self._course_rooms = [[i for i, room in enumerate(rooms) if course in Commons.REP_ROOMS[room]]
+                              for course in courses]
+        self._course_values = [[self._value_ids[(teacher, course)] for teacher in rep_courses[course]]
+                               for course in courses]
+        self._rooms = list(range(len(rooms)))
+        super().__init__(max_iter=max_iter, improvement=improvement, **engine_options)
+
+    def solve(self) -> Sol:
+        """ the best timetable found, decoded """
+        solution = super().solve()
+        return self._decode(solution) if solution is not None else None
+
+    def _decode(self, solution: Encoded) -> Sol:
+        return {var: self._VALUES[val] if val != EMPTY else None for var, val in zip(self._VARS, solution)}
 
     def _restart(self) -> None:
-        self._teacher_table.clear()
-        self._teacher_hours = {teacher: 0 for teacher in Commons.TEACHERS}
-        self._course_allocs = {course: 0 for course in Commons.COURSES}
-
-    def _generate_initial_solution(self) -> Sol:
-        sol = {}
-        for (day, slot, room) in self._ALL_SLOTS:
-            found = False
-            while not found:
-                if random.random() < 0.3:
-                    course, teacher = None, None
-                else:
-                    course = choice(list(Commons.REP_ROOMS[room]))
-                    teacher = choice(list(Commons.REP_COURSES[course]))
-                found = not (teacher and self._teacher_table.get((day, slot, teacher)))
-
-            sol[(day, slot, room)] = (teacher, course) if teacher else None
-            if teacher and course:
-                self._teacher_table[(day, slot, teacher)] = (room, course)
-                self._teacher_hours[teacher] += 1
-                self._course_allocs[course] += Commons.CAP_ROOMS[room]
+        self._teacher_table = array('i', [EMPTY]) * (len(self._ALL_SLOTS) // self._n_rooms * self._n_teachers)
+        self._teacher_hours = [0] * self._n_teachers
+        self._course_allocs = [0] * self._n_courses
+
+    def _generate_initial_solution(self) -> Encoded:
+        if self._initial is not None:
+            initial, self._initial = self._initial, None
+            sol = self._warm_solution(initial)
+        else: sol = self._random_solution()
+        if self._neighbourhood == 'focused': self._index_violations(sol)
         return sol
 
-    def _evaluate(self, solution: Sol) -> float:
-        teacher_max_hours: dict[Teacher, int] = {}
+    def _busy(self, var: int, teacher: int) -> bool:
+        """ whether the teacher teaches in the period of var """
+        return self._teacher_table[var // self._n_rooms * self._n_teachers + teacher] != EMPTY
+
+    def _assign(self, var: int, val: int):
+        teacher, course = self._val_teacher[val], self._val_course[val]
+        self._teacher_table[var // self._n_rooms * self._n_teachers + teacher] = var
+        self._teacher_hours[teacher] += 1
+        self._course_allocs[course] += self._room_cap[var % self._n_rooms]
+
+    def _unassign(self, var: int, val: int):
+        teacher, course = self._val_teacher[val], self._val_course[val]
+        self._teacher_table[var // self._n_rooms * self._n_teachers + teacher] = EMPTY
+        self._teacher_hours[teacher] -= 1
+        self._course_allocs[course] -= self._room_cap[var % self._n_rooms]
+
+    def _random_solution(self) -> Encoded:
+        sol = array('i', [EMPTY]) * len(self._ALL_SLOTS)
+        for var in range(len(sol)):
+            room = var % self._n_rooms
+            while True:
+                if random.random() < 0.3: val = EMPTY
+                else: val = choice(self._course_values[choice(self._room_courses[room])])
+                if val == EMPTY or not self._busy(var, self._val_teacher[val]): break
+            sol[var] = val
+            if val != EMPTY: self._assign(var, val)
+        return sol
+
+    def _warm_solution(self, initial: Sol) -> Encoded:
+        sol = array('i', [EMPTY]) * len(self._ALL_SLOTS)
+        for var in range(len(sol)):
+            val = self._value_ids.get(initial.get(self._VARS[var]), EMPTY)
+            # the teacher table holds one room for a teacher in a slot
+            if val != EMPTY and self._busy(var, self._val_teacher[val]): val = EMPTY
+            sol[var] = val
+            if val != EMPTY: self._assign(var, val)
+        return sol
+
+    def _unwanted(self, var: int, val: int) -> bool:
+        if val == EMPTY: return False
+        day, slot = divmod(var // self._n_rooms, self._n_slots)
+        teacher = self._val_teacher[val]
+        return bool(self._free_days[teacher * len(Commons.DAYS) + day] or
+                    self._free_slots[teacher * self._n_slots + slot])
+
+    def _index_violations(self, solution: Encoded):
+        self._under_courses = {course for course in range(self._n_courses)
+                               if self._course_allocs[course] < self._course_cap[course]}
+        self._over_teachers = {teacher for teacher in range(self._n_teachers) if self._teacher_hours[teacher] > 7}
+        self._unwanted_slots = {var for var in range(len(solution)) if self._unwanted(var, solution[var])}
+
+    def _update_violations(self, var: int, val: int, old_val: int):
+        """ updates the violation index after var changed to val from old_val """
+        changed = [v for v in (old_val, val) if v != EMPTY]
+        for course in {self._val_course[v] for v in changed}:
+            if self._course_allocs[course] < self._course_cap[course]: self._under_courses.add(course)
+            else: self._under_courses.discard(course)
+        for teacher in {self._val_teacher[v] for v in changed}:
+            if self._teacher_hours[teacher] > 7: self._over_teachers.add(teacher)
+            else: self._over_teachers.discard(teacher)
+        if self._unwanted(var, val): self._unwanted_slots.add(var)
+        else: self._unwanted_slots.discard(var)
+
+    def _evaluate(self, solution: Encoded) -> float:
+        teacher_max_hours: dict[int, int] = {}
         teacher_pref_day_cost: int = 0
         teacher_pref_slot_cost: int = 0
 
-        for (day, slot, room) in self._ALL_SLOTS:
-            val = solution[(day, slot, room)]
-            if not val: continue
-            teacher, _ = val
-            teacher_pref_day_cost += (day in Commons.FREE_DAYS[teacher])
-            teacher_pref_slot_cost += (slot in Commons.FREE_SLOTS[teacher])
+        n_days = len(Commons.DAYS)
+        for var, val in enumerate(solution):
+            if val == EMPTY: continue
+            day, slot = divmod(var // self._n_rooms, self._n_slots)
+            teacher = self._val_teacher[val]
+            teacher_pref_day_cost += self._free_days[teacher * n_days + day]
+            teacher_pref_slot_cost += self._free_slots[teacher * self._n_slots + slot]
             teacher_max_hours[teacher] = teacher_max_hours.get(teacher, 0) + 1
 
-        room_alloc_cost = sum(max(0, Commons.CAP_COURSES[course] - self._course_allocs[course]) 
-                              for course in self._course_allocs)
-        teacher_max_hours_cost = sum(max(0, teacher_max_hours[teacher] - 7) 
+        room_alloc_cost = sum(max(0, cap - allocs) for cap, allocs in zip(self._course_cap, self._course_allocs))
+        teacher_max_hours_cost = sum(max(0, teacher_max_hours[teacher] - 7)
                                      for teacher in teacher_max_hours)
-        
+
         cost = self._ROOM_ALLOC_WEIGHT * room_alloc_cost + \
             self._TEACHER_MAX_HOURS_WEIGHT * teacher_max_hours_cost + \
             self._TEACHER_PREF_DAY_WEIGHT * teacher_pref_day_cost + \
             self._TEACHER_PREF_SLOT_WEIGHT * teacher_pref_slot_cost
-        
+
         if DEBUG:
             print("[Initial Delta report]")
             print(f"\troom alloc: {room_alloc_cost} (w={self._ROOM_ALLOC_WEIGHT})")
@@ -84,68 +236,147 @@ class TimetableHC(HillClimbing[Sol, Action]):
             print(f"\tteacher pref day: {teacher_pref_day_cost} (w={self._TEACHER_PREF_DAY_WEIGHT})")
             print(f"\tteacher pref slot: {teacher_pref_slot_cost} (w={self._TEACHER_PREF_SLOT_WEIGHT})")
             print("[/]")
-            Commons.print_timetable(solution)
+            Commons.print_timetable(self._decode(solution))
         return cost
 
+    def _swappable(self, var1: int, var2: int) -> bool:
+        """ whether two different vars can exchange their values: each room accepts
+            the other course and each teacher is free in the other period """
+        if var1 == var2: return False
+        val1, val2 = self._solution[var1], self._solution[var2]
+        accepts = lambda var, val: \
+            self._room_accepts[var % self._n_rooms * self._n_courses + self._val_course[val]]
+        if val2 != EMPTY and (not accepts(var1, val2) or self._busy(var1, self._val_teacher[val2])): return False
+        if val1 != EMPTY and (not accepts(var2, val1) or self._busy(var2, self._val_teacher[val1])): return False
+        return True
+
     def _generate_actions(self):
+        if self._neighbourhood == 'sampled': return self._sample_actions()
+        if self._neighbourhood == 'focused': return self._focused_actions()
         random.shuffle(self._ALL_SLOTS)
         changes: Iterator[Action] = (
-            ('change', (day, slot, room), val)
-            for (day, slot, room) in self._ALL_SLOTS
-            for val in chain(self._ALL_VALUES(room), [None])
-            if not (val and self._teacher_table.get((day, slot, val[A_TEACHER])))
-            and (val or random.random() < 0.3)
+            ('change', var, val)
+            for var in self._ALL_SLOTS
+            for val in self._room_values[var % self._n_rooms]
+            if not (val != EMPTY and self._busy(var, self._val_teacher[val]))
+            and (val != EMPTY or random.random() < 0.3)
         )
-        p = lambda x: True
-        a = lambda i, t: t if not t else t 
         swaps: Iterator[Action] = (
-            ('swap', (day1, slot1, room1), (day2, slot2, room2))
-            for (day1, slot1, room1), (day2, slot2, room2) in product(self._ALL_SLOTS, repeat=2)
-            if p(((day1, slot1, room1), (day2, slot2, room2))) and
-               a(1, (val1 := self._solution.get((day1, slot1, room1)) or (None, None))) and
-               a(2, (val2 := self._solution.get((day2, slot2, room2)) or (None, None))) and
-               a(3, ((course1 := val1[A_COURSE]) or True) and ((course2 := val2[A_COURSE]) or True)) and
-               a(4, ((teacher1 := val1[A_TEACHER]) or True) and ((teacher2 := val2[A_TEACHER]) or True)) and
-               a(5, ((day1, slot1, room1) != (day2, slot2, room2))) and
-               a(6, (not course2 or course2 in Commons.REP_ROOMS[room1])) and
-               a(7, (not course1 or course1 in Commons.REP_ROOMS[room2])) and
-               a(8, not (teacher2 and self._teacher_table.get((day1, slot1, teacher2)))) and
-               a(9, not (teacher1 and self._teacher_table.get((day2, slot2, teacher1))))
+            ('swap', var1, var2)
+            for var1, var2 in product(self._ALL_SLOTS, repeat=2)
+            if self._swappable(var1, var2)
         )
         return (x for x in chain.from_iterable(zip_longest(changes, swaps)) if x is not None)
-    
+
+    def _random_action(self, var1: int, course: int | None = None) -> Action | None:
+        """ a random action on var1 drawn from the compatibility indexes (None if the drawn one is not
+            valid): a change to another value of the room (teaching course if given) or a swap with
+            a var of a room accepting the course of var1 """
+        val1 = self._solution[var1]
+        if course is not None or random.random() < 0.5:
+            val = choice(self._course_values[course] if course is not None else self._room_values[var1 % self._n_rooms])
+            if val == val1 or (val != EMPTY and self._busy(var1, self._val_teacher[val])): return None
+            return ('change', var1, val)
+        room2 = choice(self._course_rooms[self._val_course[val1]] if val1 != EMPTY else self._rooms)
+        var2 = random.randrange(len(self._ALL_SLOTS) // self._n_rooms) * self._n_rooms + room2
+        val2 = self._solution[var2]
+        if val1 == val2: return None
+        if val2 != EMPTY and not self._room_accepts[var1 % self._n_rooms * self._n_courses + self._val_course[val2]]:
+            return None
+        if val2 != EMPTY and self._busy(var1, self._val_teacher[val2]): return None
+        if val1 != EMPTY and self._busy(var2, self._val_teacher[val1]): return None
+        return ('swap', var1, var2)
+
+    def _sample_actions(self) -> Iterator[Action]:
+        """ up to sample_size random actions on random slots, in constant memory """
+        drawn = 0
+        for _ in range(2 * self._sample_size):
+            if drawn == self._sample_size: return
+            action = self._random_action(random.randrange(len(self._ALL_SLOTS)))
+            if action:
+                drawn += 1
+                yield action
+
+    def _focused_actions(self) -> Iterator[Action]:
+        """ up to sample_size random actions touching a random violation: on a slot of a teacher
+            that prefers another day or interval or teaches more than 7 slots, or giving a course
+            below its capacity one more slot in a room that accepts it """
+        slots, courses = list(self._unwanted_slots), list(self._under_courses)
+        periods = len(self._ALL_SLOTS) // self._n_rooms
+        teacher_slots = [[var for period in range(periods)
+                          if (var := self._teacher_table[period * self._n_teachers + teacher]) != EMPTY]
+                         for teacher in self._over_teachers]
+        violations = len(slots) + len(teacher_slots) + len(courses)
+        if not violations: return
+        drawn = 0
+        for _ in range(2 * self._sample_size):
+            if drawn == self._sample_size: return
+            i = random.randrange(violations)
+            if i < len(slots):
+                action = self._random_action(slots[i])
+            elif i < len(slots) + len(teacher_slots):
+                action = self._random_action(choice(teacher_slots[i - len(slots)]))
+            else:
+                course = courses[i - len(slots) - len(teacher_slots)]
+                var = random.randrange(periods) * self._n_rooms + choice(self._course_rooms[course])
+                action = self._random_action(var, course)
+            if action:
+                drawn += 1
+                yield action
+
+    def _tabu_keys(self, action: Action) -> Iterable[Hashable]:
+        # the slots the action changes
+        return (action[1],) if action[0] == 'change' else (action[1], action[2])
+
     def _evaluate_action(self, action: Action, debug=False) -> float:
         if action[0] == 'change':
             return self._evaluate_change_action(action[1], action[2], debug)
         return self._evaluate_swap_action(action[1], action[2], debug)
 
-    # can you believe this whole function runs in O(1) time? (considering teacher's preferences as constant)
-    def _evaluate_change_action(self, var: Var, val: Val, debug=False) -> float:
+    def _hours(self, val: int) -> int:
+        """ the slots of the teacher of val (0 for the empty value) """
+        return self._teacher_hours[self._val_teacher[val]] if val != EMPTY else 0
+
+    def _missing(self, val: int) -> int:
+        """ the capacity missing from the course of val (0 for the empty value) """
+        if val == EMPTY: return 0
+        course = self._val_course[val]
+        return self._course_cap[course] - self._course_allocs[course]
+
+    def _evaluate_change_action(self, var: int, val: int, debug=False) -> float:
         # the way of choosing actions guarantees that the teacher is not already assigned to the slot
-        delta = 0
-        day, slot, room = var
-        old_teacher, old_course = self._solution[var] or (None, None)
-        teacher, course = val or (None, None)
-        # check number of hours for the teacher
-        delta_hours = (not not teacher and (self._teacher_hours[teacher] >= 7)) - \
-                      (not not old_teacher and (self._teacher_hours[old_teacher] > 7))
-        delta += self._TEACHER_MAX_HOURS_WEIGHT * delta_hours
-        # check if the course is fully allocated
-        delta_course = lambda course_, dec: 0 if not course_ else \
-            max(0, Commons.CAP_COURSES[course_] - self._course_allocs[course_] - dec * Commons.CAP_ROOMS[room]) - \
-            max(0, Commons.CAP_COURSES[course_] - self._course_allocs[course_])
-        delta_courses = delta_course(course, 1) + delta_course(old_course, -1)
-        delta += self._ROOM_ALLOC_WEIGHT * delta_courses
-        # check teacher preferences
-        delta_pref_day = (not not teacher and day in Commons.FREE_DAYS[teacher]) - \
-                         (not not old_teacher and day in Commons.FREE_DAYS[old_teacher])
-        delta += self._TEACHER_PREF_DAY_WEIGHT * delta_pref_day
-        delta_pref_slot = (not not teacher and slot in Commons.FREE_SLOTS[teacher]) - \
-                          (not not old_teacher and slot in Commons.FREE_SLOTS[old_teacher])
-        delta += self._TEACHER_PREF_SLOT_WEIGHT * delta_pref_slot
+        old_val = self._solution[var]
+        return self._change_delta(var, val, old_val, self._hours(val), self._hours(old_val),
+                                  self._missing(val), self._missing(old_val), debug)
+
+    # can you believe this whole function runs in O(1) time?
+    def _change_delta(self, var: int, val: int, old_val: int, hours: int, old_hours: int,
+                      missing: int, old_missing: int, debug=False) -> float:
+        """ the delta of changing var to val from old_val, given the hours of the teachers and
+            the capacity missing from the courses of val and old_val """
+        day, slot = divmod(var // self._n_rooms, self._n_slots)
+        cap = self._room_cap[var % self._n_rooms]
+        n_days = len(Commons.DAYS)
+        delta_hours = delta_courses = delta_pref_day = delta_pref_slot = 0
+        # the number of hours of the teachers, whether the courses are fully allocated and the
+        # teacher preferences, with the new value and without the old one
+        if val != EMPTY:
+            teacher = self._val_teacher[val]
+            delta_hours += hours >= 7
+            delta_courses += max(0, missing - cap) - max(0, missing)
+            delta_pref_day += self._free_days[teacher * n_days + day]
+            delta_pref_slot += self._free_slots[teacher * self._n_slots + slot]
+        if old_val != EMPTY:
+            teacher = self._val_teacher[old_val]
+            delta_hours -= old_hours > 7
+            delta_courses += max(0, old_missing + cap) - max(0, old_missing)
+            delta_pref_day -= self._free_days[teacher * n_days + day]
+            delta_pref_slot -= self._free_slots[teacher * self._n_slots + slot]
+        delta = self._TEACHER_MAX_HOURS_WEIGHT * delta_hours + self._ROOM_ALLOC_WEIGHT * delta_courses + \
+            self._TEACHER_PREF_DAY_WEIGHT * delta_pref_day + self._TEACHER_PREF_SLOT_WEIGHT * delta_pref_slot
         if debug:
-            tally = sum(max(0, Commons.CAP_COURSES[course] - self._course_allocs[course]) for course in self._course_allocs)
-            print(f"[Delta report {var} -> {val}]")
+            tally = sum(max(0, cap - allocs) for cap, allocs in zip(self._course_cap, self._course_allocs))
+            print(f"[Delta report {self._VARS[var]} -> {self._VALUES[val] if val != EMPTY else None}]")
             print(f"\troom alloc: {delta_courses} (w={self._ROOM_ALLOC_WEIGHT})\t(tally: {tally})")
             print(f"\tteacher max hours: {delta_hours} (w={self._TEACHER_MAX_HOURS_WEIGHT})")
             print(f"\tteacher pref day: {delta_pref_day} (w={self._TEACHER_PREF_DAY_WEIGHT})")
@@ -154,37 +385,96 @@ class TimetableHC(HillClimbing[Sol, Action]):
             print("[/]")
         return delta
 
-    def _evaluate_swap_action(self, var1: Var, var2: Var, debug=False) -> float:
-        # calculate the delta of the swap by simulating the swap and calculating the sum
-        # of the deltas of the changes
-        aux_val1 = self._solution[var1]
-        change1 = self._evaluate_change_action(var1, self._solution[var2], debug)
-        self._apply_action(('change', var1, self._solution[var2]), sim=True)
-        change2 = self._evaluate_change_action(var2, aux_val1, debug)
-        self._apply_action(('change', var1, aux_val1), sim=True)
+    def _evaluate_actions(self, actions: list[Action]) -> list[float]:
+        """ the deltas of _evaluate_action for a batch of actions, computed together with numpy from the
+            hours, allocations and preference tables, without simulating the swaps """
+        n = len(actions)
+        swap = np.fromiter((action[0] == 'swap' for action in actions), bool, n)
+        var1 = np.fromiter((action[1] for action in actions), np.intp, n)
+        arg = np.fromiter((action[2] for action in actions), np.intp, n)
+        solution = np.frombuffer(self._solution, np.int32)
+        # every action changes var1 from val1 to val2, a swap then changes var2 from val2 to val1
+        val1 = solution[var1]
+        val2 = np.where(swap, solution[np.where(swap, arg, 0)], arg)
+        hours = np.array(self._teacher_hours)
+        missing = self._np_course_cap - np.array(self._course_allocs)
+        teacher1, teacher2 = self._np_val_teacher[val1], self._np_val_teacher[val2]
+        course1, course2 = self._np_val_course[val1], self._np_val_course[val2]
+        deltas = self._change_deltas(var1, val2, val1, hours[teacher2], hours[teacher1],
+                                     missing[course2], missing[course1])
+
+        # the second change of the swaps sees the hours and allocations after the first one
+        s = np.flatnonzero(swap)
+        var2, val1, val2 = arg[s], val1[s], val2[s]
+        teacher1, teacher2, course1, course2 = teacher1[s], teacher2[s], course1[s], course2[s]
+        full1, full2 = val1 != EMPTY, val2 != EMPTY
+        cap1 = self._np_room_cap[var1[s] % self._n_rooms]
+        hours1 = hours[teacher1] - full1 + (full2 & (teacher1 == teacher2))
+        hours2 = hours[teacher2] - (full1 & (teacher1 == teacher2)) + full2
+        missing1 = missing[course1] + cap1 * full1 - cap1 * (full2 & (course1 == course2))
+        missing2 = missing[course2] + cap1 * (full1 & (course1 == course2)) - cap1 * full2
+        deltas[s] += self._change_deltas(var2, val1, val2, hours1, hours2, missing1, missing2)
+        return deltas.tolist()
+
+    def _change_deltas(self, var: np.ndarray, val: np.ndarray, old_val: np.ndarray, hours: np.ndarray,
+                       old_hours: np.ndarray, missing: np.ndarray, old_missing: np.ndarray) -> np.ndarray:
+        """ _change_delta of every var to val from old_val, given the hours of the teachers and
+            the capacity missing from the courses of val and old_val """
+        day, slot = np.divmod(var // self._n_rooms, self._n_slots)
+        cap = self._np_room_cap[var % self._n_rooms]
+        n_days = len(Commons.DAYS)
+        new, old = val != EMPTY, old_val != EMPTY
+        teacher, old_teacher = self._np_val_teacher[val], self._np_val_teacher[old_val]
+        delta_hours = (new & (hours >= 7)).astype(int) - (old & (old_hours > 7))
+        delta_courses = np.where(new, np.maximum(0, missing - cap) - np.maximum(0, missing), 0) + \
+            np.where(old, np.maximum(0, old_missing + cap) - np.maximum(0, old_missing), 0)
+        delta_pref_day = np.where(new, self._np_free_days[teacher * n_days + day], 0) - \
+            np.where(old, self._np_free_days[old_teacher * n_days + day], 0)
+        delta_pref_slot = np.where(new, self._np_free_slots[teacher * self._n_slots + slot], 0) - \
+            np.where(old, self._np_free_slots[old_teacher * self._n_slots + slot], 0)
+        return self._TEACHER_MAX_HOURS_WEIGHT * delta_hours + self._ROOM_ALLOC_WEIGHT * delta_courses + \
+            self._TEACHER_PREF_DAY_WEIGHT * delta_pref_day + self._TEACHER_PREF_SLOT_WEIGHT * delta_pref_slot
+
+    def _evaluate_swap_action(self, var1: int, var2: int, debug=False) -> float:
+        # the swap changes var1 to val2, then var2 to val1 with the hours and allocations
+        # after the first change, worked out here instead of applying it (as in _evaluate_actions)
+        val1, val2 = self._solution[var1], self._solution[var2]
+        hours1, hours2 = self._hours(val1), self._hours(val2)
+        missing1, missing2 = self._missing(val1), self._missing(val2)
+        change1 = self._change_delta(var1, val2, val1, hours2, hours1, missing2, missing1, debug)
+        full1, full2 = val1 != EMPTY, val2 != EMPTY
+        same_teacher = full1 and full2 and self._val_teacher[val1] == self._val_teacher[val2]
+        same_course = full1 and full2 and self._val_course[val1] == self._val_course[val2]
+        cap1 = self._room_cap[var1 % self._n_rooms]
+        hours1, hours2 = hours1 - full1 + same_teacher, hours2 - same_teacher + full2
+        missing1, missing2 = missing1 + cap1 * (full1 - same_course), missing2 + cap1 * (same_course - full2)
+        change2 = self._change_delta(var2, val1, val2, hours1, hours2, missing1, missing2, debug)
         return change1 + change2
-    
+
     def _apply_action(self, action: Action, sim=False) -> None:
         if DEBUG and not sim:
             self._evaluate_action(action, debug=True)
             print(f"Applying action: {action}")
         if action[0] == 'change':
             var, val = action[1], action[2]
-            day, slot, room = var
-            teacher, course = val or (None, None)
-            old_teacher, old_course = self._solution[var] or (None, None)
+            old_val = self._solution[var]
+            if old_val != EMPTY: self._unassign(var, old_val)
             self._solution[var] = val
-            if teacher and course:
-                self._teacher_table[(day, slot, teacher)] = (room, course)
-                self._teacher_hours[teacher] += 1
-                self._course_allocs[course] += Commons.CAP_ROOMS[room]
-            if old_teacher and old_course:
-                self._teacher_table[(day, slot, old_teacher)] = None
-                self._teacher_hours[old_teacher] -= 1
-                self._course_allocs[old_course] -= Commons.CAP_ROOMS[room]
+            if val != EMPTY: self._assign(var, val)
+            if self._neighbourhood == 'focused': self._update_violations(var, val, old_val)
         else:
             val1, val2 = self._solution[action[1]], self._solution[action[2]]
             self._apply_action(('change', action[1], val2), sim=True)
             self._apply_action(('change', action[2], val1), sim=True)
         if DEBUG and not sim:
-            Commons.print_timetable(self._solution)
\ No newline at end of file
+            Commons.print_timetable(self._decode(self._solution))
+
+
+# the same timetable search under the other engines (the hooks above are shared)
+class TimetableSA(TimetableHC, SimulatedAnnealing[Encoded, Action]):
+    pass
+
+class TimetableTabu(TimetableHC, TabuSearch[Encoded, Action]):
+    pass
+
+ENGINES: dict[str, type[TimetableHC]] = {'hc': TimetableHC, 'sa': TimetableSA, 'tabu': TimetableTabu}